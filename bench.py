@@ -0,0 +1,184 @@
+"""Замеры производительности горячих путей Zvonki.
+
+Запускается без дисплея и звукового устройства (платформа Qt offscreen), конфигурация создаётся
+во временном каталоге и не затрагивает рабочую. Результаты пишутся в JSON (по умолчанию во временный
+каталог, а не в дерево исходников), чтобы сравнивать версии:
+
+    python bench.py -o before.json
+    python bench.py -o after.json --compare before.json
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+from time import perf_counter
+from statistics import median
+from typing import List, Dict, Any, Callable, Optional
+
+# До импорта main: каталог конфигурации вычисляется от домашнего каталога при импорте
+HOME: str = tempfile.mkdtemp(prefix='zvonki-bench-')
+os.environ['HOME'] = os.environ['USERPROFILE'] = HOME
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import main  # noqa: E402
+from PyQt6.QtCore import QT_VERSION_STR, QDate  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+TIMES: List[str] = [f'{h:02}:{m:02}:00' for h in range(8, 16) for m in (0, 45)]
+
+
+class Bench:
+    """Собирает результаты замеров."""
+
+    def __init__(self, repeat: int) -> None:
+        self.repeat: int = repeat
+        self.results: List[Dict[str, Any]] = []
+
+    def measure(self, name: str, n: int, func: Callable[[], Any], setup: Optional[Callable[[], Any]] = None,
+                inner: int = 1) -> None:
+        """Замеряет func repeat раз (setup выполняется перед каждым замером и в него не входит).
+
+        inner - число вызовов func в одном замере для быстрых операций, время приводится к одному вызову.
+        """
+        samples: List[float] = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start: float = perf_counter()
+            for _ in range(inner):
+                func()
+            samples.append((perf_counter() - start) * 1000 / inner)
+        self.results.append({'name': name, 'n': n, 'repeat': self.repeat, 'min_ms': round(min(samples), 4),
+                             'median_ms': round(median(samples), 4)})
+        print(f'{name:<24} n={n:<7} min {min(samples):10.3f} ms   median {median(samples):10.3f} ms')
+
+
+def fill_schedules(n: int) -> None:
+    """Заполняет конфигурацию n включёнными расписаниями и n элементами по времени."""
+    tomorrow: str = QDate.currentDate().addDays(1).toString('dd.MM.yyyy')
+    main.config['schedules'] = {f'Расписание {i}': {'enabled': True, 'duration': 20, 'list': list(TIMES),
+                                                    'days': '123456', 'zone': ''} for i in range(n)}
+    main.config['timed_playlist'] = [{'file': f'{HOME}/timed{i}.mp3', 'time': TIMES[i % len(TIMES)],
+                                      'days': tomorrow if i % 2 else 'd12345', 'zone': ''} for i in range(n)]
+
+
+def bench_timeline(bench: Bench, window: main.MainWindow, n: int) -> None:
+    """Schedule.run и TimedPlaylist.check_and_play заменены BellTimeline: такт без событий и перепланирование."""
+    fill_schedules(n)
+    window.schedule.table.clear()
+    window.load_schedules()
+    window.timed_playlist.load_items()
+    timeline: main.BellTimeline = window.timeline
+    timeline.replan()
+    bench.measure('timeline_tick', n, timeline.replan, inner=100)
+    bench.measure('timeline_rebuild', n, timeline.replan, setup=timeline.invalidate)
+    bench.measure('timeline_edit', n, timeline.replan,
+                  setup=lambda: timeline.schedule_changed(window.schedule.table.item(0)))
+    bench.measure('timeline_prearm', n, timeline.prearm, setup=lambda: setattr(timeline, 'prearmed', None))
+
+
+def bench_config(bench: Bench, n: int) -> None:
+    """Сохранение и загрузка конфигурации в обоих хранилищах в зависимости от размера плейлиста."""
+    main.config['playlist'] = [f'{HOME}/music/Исполнитель {i} - Песня {i}.mp3' for i in range(n)]
+    json_storage: main.JsonStorage = main.JsonStorage(main.CONFIG_PATH)
+
+    def save_json() -> None:
+        json_storage.save()
+        json_storage.flush()
+
+    bench.measure('save_config_json', n, save_json)
+    bench.measure('load_config_json', n, json_storage.load)
+    sqlite_storage: main.SqliteStorage = main.SqliteStorage(main.DB_PATH)
+
+    def save_sqlite() -> None:
+        sqlite_storage.save()
+        sqlite_storage.flush()
+
+    bench.measure('save_config_sqlite', n, save_sqlite)
+    bench.measure('load_config_sqlite', n, sqlite_storage.load)
+    sqlite_storage.close()
+    os.remove(main.DB_PATH)
+
+
+def bench_playlist(bench: Bench, window: main.MainWindow, n: int) -> None:
+    """Загрузка, перемешивание и очистка плейлиста из n треков."""
+    paths: List[str] = [f'{HOME}/music/Исполнитель {i} - Песня {i}.mp3' for i in range(n)]
+
+    def reset() -> None:
+        main.config['playlist'] = list(paths)
+
+    bench.measure('load_playlist', n, window.load_playlist, setup=reset)
+    bench.measure('sort_by_random', n, window.sort_by_random, setup=reset)
+
+    def fill() -> None:
+        reset()
+        window.load_playlist()
+
+    bench.measure('delete_all', n, window.delete_all, setup=fill)
+    main.storage.flush()
+
+
+def bench_import(bench: Bench, n: int) -> None:
+    """ImportText.output и разбор файлов расписания на n строках."""
+    dialog: main.ImportText = main.ImportText()
+    dialog.name.setText('Импорт')
+    dialog.textarea.setPlainText('\n'.join(f'{i} урок {TIMES[i % len(TIMES)][:5]} - {TIMES[(i + 1) % len(TIMES)]}'
+                                           for i in range(n)))
+    bench.measure('import_text', n, dialog.output)
+    path: str = f'{HOME}/timetable.csv'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('Расписание;Дни;Время\n')
+        f.writelines(f'Класс {i % 30};пн-пт;{TIMES[i % len(TIMES)]}\n' for i in range(n))
+    bench.measure('import_csv', n, lambda: main.import_timetable(path, main.TimetableImport('Импорт')))
+
+
+def compare(results: List[Dict[str, Any]], path: str) -> None:
+    """Выводит изменение медианы относительно прошлых результатов."""
+    with open(path, encoding='utf-8') as f:
+        old: Dict[tuple[str, int], float] = {(r['name'], r['n']): r['median_ms'] for r in json.load(f)['results']}
+    print(f'\nСравнение с {path}:')
+    for r in results:
+        if (base := old.get((r['name'], r['n']))) is not None and base > 0:
+            print(f"{r['name']:<24} n={r['n']:<7} {base:10.3f} -> {r['median_ms']:10.3f} ms "
+                  f"({(r['median_ms'] / base - 1) * 100:+.1f}%)")
+
+
+def run() -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Замеры производительности Zvonki')
+    parser.add_argument('-o', '--output', default=os.path.join(tempfile.gettempdir(), 'zvonki-bench.json'),
+                        help='файл результатов JSON')
+    parser.add_argument('-n', '--sizes', default='100,1000,10000', help='размеры через запятую')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='число замеров каждой операции')
+    parser.add_argument('--compare', help='прошлые результаты JSON для сравнения')
+    args: argparse.Namespace = parser.parse_args()
+    sizes: List[int] = [int(x) for x in args.sizes.split(',')]
+
+    main.load_config()
+    app: QApplication = QApplication(sys.argv)
+    window: main.MainWindow = main.MainWindow()
+    # Звонки во время замеров не воспроизводятся
+    window.timeline.schedule_due.disconnect()
+    window.timeline.timed_due.disconnect()
+    bench: Bench = Bench(args.repeat)
+    for n in sizes:
+        bench_timeline(bench, window, n)
+        bench_config(bench, n)
+        bench_playlist(bench, window, n)
+        bench_import(bench, n)
+        app.processEvents()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'version': main.VERSION, 'python': platform.python_version(), 'qt': QT_VERSION_STR,
+                   'platform': platform.platform(), 'results': bench.results}, f, ensure_ascii=False, indent=2)
+    print(f'\nРезультаты записаны в {args.output}')
+    if args.compare:
+        compare(bench.results, args.compare)
+    main.storage.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
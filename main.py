@@ -1,50 +1,512 @@
 from __future__ import annotations
-from os.path import expanduser, exists, basename, join, dirname, abspath
-from os import mkdir, getpid
+from os.path import expanduser, exists, basename, join, dirname, abspath, isfile, isdir, splitext
+from os import mkdir, replace, fsync, stat, scandir, cpu_count
 import sys
 import json
+import heapq
+from datetime import date as Date, datetime, timezone
+from array import array
+from bisect import bisect_left, bisect_right
 from random import shuffle
+from collections import deque
+from importlib.util import find_spec
+from shutil import which
+from hashlib import sha1
 from re import findall
+from copy import deepcopy
+from abc import ABC, abstractmethod
+from itertools import chain, repeat
+from operator import itemgetter
 import logging
-from typing import List, Dict, Union, Optional, Any
-
-from PyQt6.QtGui import QAction, QIcon, QCloseEvent, QDropEvent, QDragEnterEvent
-from PyQt6.QtWidgets import QApplication, QWidget, QListWidget, QListWidgetItem, QHBoxLayout, QVBoxLayout, QCheckBox, \
-    QPushButton, QGridLayout, QDockWidget, QStyledItemDelegate, QMenu, QMessageBox, QDialog, QFileDialog, QLabel, \
-    QMenuBar, QSlider, QMainWindow, QTimeEdit, QLineEdit, QInputDialog, QSpinBox, QSystemTrayIcon, QTextEdit, \
-    QDateEdit, QComboBox
-from PyQt6.QtCore import Qt, QUrl, QTime, QTimer, QDate, pyqtSignal
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QAudioDecoder
-import psutil
-from pycaw.pycaw import AudioUtilities
-from pycaw.utils import AudioDevice
+import traceback
+from logging.handlers import RotatingFileHandler
+import threading
+import signal
+from time import monotonic, perf_counter
+from math import ceil
+from typing import List, Dict, Optional, Any, Callable, Iterable, Iterator, TYPE_CHECKING
+
+# Отсчёт для --profile-startup начинается до импорта Qt
+STARTED: float = perf_counter()
+
+from PyQt6.QtGui import QAction, QIcon, QCloseEvent, QDropEvent, QDragEnterEvent, QColor  # noqa: E402
+from PyQt6.QtWidgets import (  # noqa: E402
+    QApplication, QWidget, QListWidget, QListWidgetItem, QHBoxLayout, QVBoxLayout, QCheckBox,
+    QPushButton, QGridLayout, QDockWidget, QStyledItemDelegate, QMenu, QMessageBox, QDialog, QFileDialog, QLabel,
+    QMenuBar, QSlider, QMainWindow, QTimeEdit, QLineEdit, QInputDialog, QSpinBox, QSystemTrayIcon, QTextEdit,
+    QDateEdit, QComboBox, QListView, QProgressDialog)
+from PyQt6.QtCore import (  # noqa: E402
+    Qt, QUrl, QTime, QTimer, QDate, QDateTime, QObject, QLockFile, QAbstractListModel,
+    QModelIndex, QPropertyAnimation, QCoreApplication, pyqtSignal)
+
+# Модули, нужные не с первых миллисекунд запуска, импортируются там, где используются
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+    from PyQt6.QtNetwork import QLocalSocket, QHostAddress
+    from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QAudioDevice
 
 VERSION: str = '2.10.1'
-CONFIG_PATH: str = expanduser('~') + '/.zvonki2/config.json'
+CONFIG_DIR: str = expanduser('~') + '/.zvonki2'
+CONFIG_PATH: str = CONFIG_DIR + '/config.json'
+DB_PATH: str = CONFIG_DIR + '/config.db'
+MEDIA_CACHE_PATH: str = CONFIG_DIR + '/media_cache.json'
+STALLS_PATH: str = CONFIG_DIR + '/stalls.log'
+INSTANCE_NAME: str = 'zvonki2-' + basename(expanduser('~'))
 SUPPORTED_FILES: str = ('Аудиофайлы (*.mp3 *.wav *.ogg *.aac *.wma *.flac *.m4a *.ac3 *.eac3 *.alac *.opus);;'
                         'Видеофайлы (*.mp4 *.avi *.mkv *.wmv *.mov *.webm *.mpeg *.mpg *.vob *.ts *.m2ts '
                         '*.3gp *.3g2 *.flv);;Все файлы (*.*)')
-
-# Создание директории и файла конфигурации, если они не существуют
-if not exists(CONFIG_PATH):
-    mkdir(expanduser('~') + '/.zvonki2')
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump({"top_hint": True, "sort_restart": False, "autorun": False,
-                   "volume": 80, "playlist": [], "schedules": {}, "timed_playlist": []}, f)
-
-# Загрузка конфигурации из файла
-with open(CONFIG_PATH, encoding='utf-8') as config_file:
-    config: Dict[str, Any] = json.load(config_file)
-
-logging.basicConfig(filename=expanduser('~') + '/.zvonki2/work.log', level=logging.INFO,
-                    format='%(asctime)s %(levelname)s - %(message)s')
-
-
-def save_config() -> None:
-    """Сохраняет текущую конфигурацию в файл."""
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as config_file_w:
-        json.dump(config, config_file_w, ensure_ascii=False)
-    logging.info('Updated config file')
+SUPPORTED_EXTENSIONS: frozenset[str] = frozenset(findall(r'\*(\.\w+)', SUPPORTED_FILES))
+
+DEFAULT_CONFIG: Dict[str, Any] = {"top_hint": True, "sort_restart": False, "autorun": False, "volume": 80,
+                                  "playlist": [], "schedules": {}, "timed_playlist": [], "bell_grace": 10, "prearm": 5,
+                                  "stall_threshold": 500, "lookahead": 5, "normalize": True, "bell_fade": 2,
+                                  "zones": {}, "sync_role": "", "sync_master": "127.0.0.1", "sync_port": 45454,
+                                  "calendar": {"vacations": [], "exceptions": {}}}
+
+
+def write_atomic(path: str, data: str) -> None:
+    """Записывает файл через временный файл и os.replace, чтобы сбой посреди записи не испортил его."""
+    tmp: str = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        fsync(f.fileno())
+    replace(tmp, path)
+
+
+class ConfigWriter:
+    """Отложенная запись конфигурации.
+
+    Изменения за delay мс сводятся в один снимок, который записывается на диск в фоновом потоке.
+    """
+
+    def __init__(self, path: str, delay: int = 500) -> None:
+        self.path: str = path
+        self.delay: int = delay
+        self.timer: Optional[QTimer] = None
+        self.lock: threading.Lock = threading.Lock()
+        self.write_lock: threading.Lock = threading.Lock()
+        self.event: threading.Event = threading.Event()
+        self.pending: Optional[str] = None
+        self.thread: threading.Thread = threading.Thread(target=self.worker, name='config-writer', daemon=True)
+
+    def mark_dirty(self) -> None:
+        """Отмечает конфигурацию изменённой; запись произойдёт не позже чем через delay мс."""
+        if self.timer is None:
+            self.timer = QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.setInterval(self.delay)
+            self.timer.timeout.connect(self.snapshot)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def snapshot(self) -> None:
+        """Сериализует конфигурацию в потоке интерфейса и передаёт её фоновому потоку."""
+        data: str = json.dumps(config, ensure_ascii=False)
+        with self.lock:
+            self.pending = data
+        if not self.thread.is_alive():
+            self.thread.start()
+        self.event.set()
+
+    def write_pending(self) -> None:
+        """Записывает последний снимок, если он есть."""
+        with self.write_lock:
+            with self.lock:
+                data: Optional[str] = self.pending
+                self.pending = None
+            if data is not None:
+                try:
+                    write_atomic(self.path, data)
+                    logging.info('Updated config file')
+                except OSError as e:
+                    logging.error('Failed to save config - ' + str(e))
+
+    def worker(self) -> None:
+        """Цикл фонового потока записи."""
+        while True:
+            self.event.wait()
+            self.event.clear()
+            self.write_pending()
+
+    def flush(self) -> None:
+        """Немедленно записывает несохранённые изменения (при выходе из программы)."""
+        if self.timer is not None and self.timer.isActive():
+            self.timer.stop()
+            data: str = json.dumps(config, ensure_ascii=False)
+            with self.lock:
+                self.pending = data
+        self.write_pending()
+
+
+class Storage(ABC):
+    """Хранилище конфигурации.
+
+    Конфигурация всегда целиком находится в памяти в словаре config, хранилище получает уведомления
+    о том, что именно в нём изменилось. Базовая реализация на любое изменение вызывает save().
+    """
+    # Число изменений расписаний, элементов по времени и календаря во всех хранилищах; по нему BellSync
+    # понимает, что раздаваемые ведомым расписания надо пересобрать
+    edits: int = 0
+
+    @staticmethod
+    def edited() -> None:
+        """Отмечает изменение данных, которые ведущий узел раздаёт ведомым."""
+        Storage.edits += 1
+
+    @abstractmethod
+    def load(self) -> Dict[str, Any]:
+        """Загружает конфигурацию."""
+
+    @abstractmethod
+    def save(self) -> None:
+        """Сохраняет конфигурацию целиком."""
+
+    def flush(self) -> None:
+        """Дописывает отложенные изменения на диск."""
+
+    def close(self) -> None:
+        """Закрывает хранилище."""
+        self.flush()
+
+    def set_value(self, key: str) -> None:
+        """Изменена простая настройка config[key]."""
+        if key == 'calendar':
+            self.edited()
+        self.save()
+
+    def playlist_added(self, urls: List[str]) -> None:
+        """В конец плейлиста добавлены треки."""
+        self.save()
+
+    def playlist_removed(self, rows: List[int]) -> None:
+        """Из плейлиста удалены строки rows (по убыванию)."""
+        self.save()
+
+    def playlist_reset(self) -> None:
+        """Плейлист изменён целиком."""
+        self.save()
+
+    def playlist_moved(self, first: int, last: int) -> None:
+        """Переставлены строки плейлиста first..last-1, их число не изменилось."""
+        self.save()
+
+    def schedule_changed(self, name: str) -> None:
+        """Расписание добавлено или изменено."""
+        self.edited()
+        self.save()
+
+    def schedule_renamed(self, old: str, new: str) -> None:
+        """Расписание переименовано."""
+        self.edited()
+        self.save()
+
+    def schedule_removed(self, name: str) -> None:
+        """Расписание удалено."""
+        self.edited()
+        self.save()
+
+    def schedules_replaced(self) -> None:
+        """Расписания, элементы плейлиста по времени и календарь заменены целиком (синхронизация)."""
+        self.edited()
+        self.save()
+
+    def timed_added(self, entry: Dict[str, str]) -> None:
+        """Добавлен элемент плейлиста по времени."""
+        self.edited()
+        self.save()
+
+    def imported(self, names: List[str], entries: List[Dict[str, str]]) -> None:
+        """Импортированы расписания names и элементы плейлиста по времени entries."""
+        self.edited()
+        self.save()
+
+    def timed_removed(self, entries: List[Dict[str, str]]) -> None:
+        """Удалены элементы плейлиста по времени."""
+        self.edited()
+        self.save()
+
+    def timed_updated(self, old: Dict[str, str], new: Dict[str, str]) -> None:
+        """Изменён элемент плейлиста по времени."""
+        self.edited()
+        self.save()
+
+
+class JsonStorage(Storage):
+    """Хранение в config.json: любое изменение приводит к отложенной перезаписи файла целиком."""
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.writer: ConfigWriter = ConfigWriter(path)
+
+    def load(self) -> Dict[str, Any]:
+        if not exists(self.path):
+            write_atomic(self.path, json.dumps(DEFAULT_CONFIG))
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self) -> None:
+        self.writer.mark_dirty()
+
+    def flush(self) -> None:
+        self.writer.flush()
+
+
+class SqliteStorage(Storage):
+    """Хранение в SQLite (режим WAL): изменения записываются отдельными строками, а не всем файлом.
+
+    Поток интерфейса только ставит запросы в очередь, выполняет их фоновый поток: всё, что накопилось
+    за время предыдущей записи, фиксируется одной транзакцией.
+    """
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS playlist (pos INTEGER PRIMARY KEY, path TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS playlist_path ON playlist (path);
+        CREATE TABLE IF NOT EXISTS schedules (
+            name TEXT PRIMARY KEY, enabled INTEGER NOT NULL, duration INTEGER NOT NULL, days TEXT NOT NULL,
+            zone TEXT NOT NULL DEFAULT '', times TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS timed (id INTEGER PRIMARY KEY, file TEXT NOT NULL, time TEXT NOT NULL,
+                                          days TEXT NOT NULL, zone TEXT NOT NULL DEFAULT '');
+        CREATE INDEX IF NOT EXISTS timed_entry ON timed (file, time, days);
+    """
+    TABLES: tuple[str, ...] = ('playlist', 'schedules', 'timed_playlist')
+    UPSERT_SETTING: str = 'INSERT INTO settings VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value'
+    UPSERT_SCHEDULE: str = ('INSERT INTO schedules VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET '
+                            'enabled = excluded.enabled, duration = excluded.duration, days = excluded.days, '
+                            'zone = excluded.zone, times = excluded.times')
+    INSERT_TIMED: str = 'INSERT INTO timed (file, time, days, zone) VALUES (?, ?, ?, ?)'
+    MATCH_TIMED: str = 'SELECT id FROM timed WHERE file = ? AND time = ? AND days = ? AND zone = ? ORDER BY id LIMIT 1'
+
+    def __init__(self, path: str) -> None:
+        import sqlite3
+        # Соединением пользуется фоновый поток записи, а при загрузке - поток интерфейса, по очереди под write_lock
+        self.conn: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self.keys: List[int] = []  # Ключи pos строк плейлиста в порядке config['playlist']
+        self.queue: deque[tuple[str, Any, bool]] = deque()  # (запрос, параметры, executemany)
+        self.lock: threading.Lock = threading.Lock()
+        self.write_lock: threading.Lock = threading.Lock()
+        self.event: threading.Event = threading.Event()
+        self.thread: threading.Thread = threading.Thread(target=self.worker, name='sqlite-writer', daemon=True)
+
+    def execute(self, *ops: tuple[str, Any, bool]) -> None:
+        """Ставит запросы в очередь записи; параметры должны быть готовыми значениями, а не ссылками на config."""
+        with self.lock:
+            self.queue.extend(ops)
+        if not self.thread.is_alive():
+            self.thread.start()
+        self.event.set()
+
+    def write_pending(self) -> None:
+        """Выполняет накопившиеся запросы одной транзакцией."""
+        import sqlite3
+        with self.write_lock:
+            with self.lock:
+                ops: List[tuple[str, Any, bool]] = list(self.queue)
+                self.queue.clear()
+            if not ops:
+                return
+            try:
+                with self.conn:
+                    for sql, params, many in ops:
+                        try:
+                            if many:
+                                self.conn.executemany(sql, params)
+                            else:
+                                self.conn.execute(sql, params)
+                        except sqlite3.Error as e:
+                            logging.error(f'Failed to save config - {e}')
+            except sqlite3.Error as e:
+                logging.error(f'Failed to commit config - {e}')
+
+    def worker(self) -> None:
+        """Цикл фонового потока записи."""
+        while True:
+            self.event.wait()
+            self.event.clear()
+            self.write_pending()
+
+    def flush(self) -> None:
+        self.write_pending()
+
+    def load(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = deepcopy(DEFAULT_CONFIG)
+        with self.write_lock:
+            data.update((k, json.loads(v)) for k, v in self.conn.execute('SELECT key, value FROM settings'))
+            rows: List[tuple[int, str]] = self.conn.execute('SELECT pos, path FROM playlist ORDER BY pos').fetchall()
+            self.keys = [pos for pos, _ in rows]
+            data['playlist'] = [path for _, path in rows]
+            data['schedules'] = {
+                name: {"enabled": bool(enabled), "duration": duration, "list": json.loads(times), "days": days,
+                       "zone": zone}
+                for name, enabled, duration, days, zone, times in self.conn.execute(
+                    'SELECT name, enabled, duration, days, zone, times FROM schedules ORDER BY rowid')}
+            data['timed_playlist'] = [{'file': f, 'time': t, 'days': d, 'zone': z} for f, t, d, z in self.conn.execute(
+                'SELECT file, time, days, zone FROM timed ORDER BY id')]
+        return data
+
+    def save(self) -> None:
+        settings: List[tuple[str, str]] = [(k, json.dumps(v, ensure_ascii=False))
+                                           for k, v in config.items() if k not in self.TABLES]
+        self.execute(('DELETE FROM settings', (), False), ('INSERT INTO settings VALUES (?, ?)', settings, True))
+        self.playlist_reset()
+        self.schedules_replaced()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def set_value(self, key: str) -> None:
+        if key == 'calendar':
+            self.edited()
+        self.execute((self.UPSERT_SETTING, (key, json.dumps(config[key], ensure_ascii=False)), False))
+
+    def playlist_added(self, urls: List[str]) -> None:
+        start: int = self.keys[-1] + 1 if self.keys else 1
+        keys: List[int] = list(range(start, start + len(urls)))
+        self.keys.extend(keys)
+        self.execute(('INSERT INTO playlist (pos, path) VALUES (?, ?)', list(zip(keys, urls)), True))
+
+    def playlist_removed(self, rows: List[int]) -> None:
+        removed: set[int] = set(rows)
+        self.execute(('DELETE FROM playlist WHERE pos = ?', [(self.keys[i],) for i in rows], True))
+        self.keys = [pos for i, pos in enumerate(self.keys) if i not in removed]
+
+    def playlist_reset(self) -> None:
+        self.keys = list(range(1, len(config['playlist']) + 1))
+        self.execute(('DELETE FROM playlist', (), False),
+                     ('INSERT INTO playlist (pos, path) VALUES (?, ?)', list(zip(self.keys, config['playlist'])), True))
+
+    def playlist_moved(self, first: int, last: int) -> None:
+        # Ключи строк остаются на месте, в них переписываются пути нового порядка
+        self.execute(('UPDATE playlist SET path = ? WHERE pos = ?',
+                      list(zip(config['playlist'][first:last], self.keys[first:last])), True))
+
+    @staticmethod
+    def schedule_row(name: str) -> tuple[str, int, int, str, str, str]:
+        """Возвращает строку таблицы schedules; времена хранятся в ней же списком JSON."""
+        data: Dict[str, Any] = config['schedules'][name]
+        return name, int(data['enabled']), data['duration'], data['days'], data['zone'], json.dumps(data['list'])
+
+    def schedule_changed(self, name: str) -> None:
+        self.edited()
+        self.execute((self.UPSERT_SCHEDULE, self.schedule_row(name), False))
+
+    def schedule_renamed(self, old: str, new: str) -> None:
+        self.edited()
+        self.execute(('UPDATE schedules SET name = ? WHERE name = ?', (new, old), False))
+
+    def schedule_removed(self, name: str) -> None:
+        self.edited()
+        self.execute(('DELETE FROM schedules WHERE name = ?', (name,), False))
+
+    def schedules_replaced(self) -> None:
+        self.edited()
+        schedules: List[tuple] = list(map(self.schedule_row, config['schedules']))
+        timed: List[tuple[str, str, str, str]] = [(x['file'], x['time'], x['days'], x['zone'])
+                                                  for x in config['timed_playlist']]
+        self.execute(('DELETE FROM schedules', (), False),
+                     ('INSERT INTO schedules VALUES (?, ?, ?, ?, ?, ?)', schedules, True),
+                     ('DELETE FROM timed', (), False),
+                     (self.INSERT_TIMED, timed, True),
+                     (self.UPSERT_SETTING, ('calendar', json.dumps(config['calendar'], ensure_ascii=False)), False))
+
+    def timed_added(self, entry: Dict[str, str]) -> None:
+        self.edited()
+        self.execute((self.INSERT_TIMED, (entry['file'], entry['time'], entry['days'], entry['zone']), False))
+
+    def imported(self, names: List[str], entries: List[Dict[str, str]]) -> None:
+        self.edited()
+        self.execute((self.UPSERT_SCHEDULE, list(map(self.schedule_row, names)), True),
+                     (self.INSERT_TIMED, [(x['file'], x['time'], x['days'], x['zone']) for x in entries], True))
+
+    def timed_removed(self, entries: List[Dict[str, str]]) -> None:
+        self.edited()
+        self.execute((f'DELETE FROM timed WHERE id = ({self.MATCH_TIMED})',
+                      [(x['file'], x['time'], x['days'], x['zone']) for x in entries], True))
+
+    def timed_updated(self, old: Dict[str, str], new: Dict[str, str]) -> None:
+        self.edited()
+        self.execute((f'UPDATE timed SET file = ?, time = ?, days = ?, zone = ? WHERE id = ({self.MATCH_TIMED})',
+                      (new['file'], new['time'], new['days'], new['zone'],
+                       old['file'], old['time'], old['days'], old['zone']), False))
+
+
+def switch_storage(use_sqlite: bool) -> None:
+    """Переключает хранилище конфигурации, перенося в новое текущие данные.
+
+    При переходе на SQLite config.json переименовывается в config.json.bak, при возврате
+    к JSON так же откладывается база.
+    """
+    global storage
+    if use_sqlite == isinstance(storage, SqliteStorage):
+        return
+    storage.flush()
+    new: Storage
+    if use_sqlite:
+        new = SqliteStorage(DB_PATH)
+        new.save()
+        new.flush()
+        storage.close()
+        replace(CONFIG_PATH, CONFIG_PATH + '.bak')
+    else:
+        write_atomic(CONFIG_PATH, json.dumps(config, ensure_ascii=False))
+        new = JsonStorage(CONFIG_PATH)
+        storage.close()
+        replace(DB_PATH, DB_PATH + '.bak')
+    storage = new
+    logging.warning(f'Switched config storage to {"SQLite" if use_sqlite else "JSON"}')
+
+
+storage: Storage = JsonStorage(CONFIG_PATH)  # load_config заменяет его базой, если она включена
+config: Dict[str, Any] = {}
+
+
+def load_config() -> None:
+    """Создаёт каталог программы, настраивает журнал и загружает конфигурацию.
+
+    Конфигурация читается из базы, если она включена, иначе из config.json (создаётся при первом запуске).
+    """
+    global storage
+    if not exists(CONFIG_DIR):
+        mkdir(CONFIG_DIR)
+    logging.basicConfig(filename=CONFIG_DIR + '/work.log', level=logging.INFO,
+                        format='%(asctime)s %(levelname)s - %(message)s')
+    if exists(DB_PATH):
+        storage = SqliteStorage(DB_PATH)
+    config.clear()
+    config.update(storage.load())
+    for key, value in DEFAULT_CONFIG.items():
+        config.setdefault(key, deepcopy(value))
+    # Расписания и элементы по времени из версий без зон играют в основной зоне
+    for entry in [*config['schedules'].values(), *config['timed_playlist']]:
+        entry.setdefault('zone', '')
+
+
+class StartupProfile:
+    """Замер длительности этапов запуска (--profile-startup)."""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled: bool = enabled
+        self.last: float = STARTED
+        self.phases: List[tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        """Завершает этап phase."""
+        now: float = perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self) -> None:
+        """Выводит длительности этапов в консоль и журнал."""
+        if not self.enabled:
+            return
+        lines: List[str] = [f'{phase}: {dt * 1000:.1f} ms' for phase, dt in self.phases]
+        lines.append(f'total: {(self.last - STARTED) * 1000:.1f} ms')
+        print('\n'.join(lines))
+        logging.info('Startup profile - ' + '; '.join(lines))
 
 
 def mseconds_to_time(mseconds: int) -> str:
@@ -55,23 +517,79 @@ def mseconds_to_time(mseconds: int) -> str:
     return f"{hh}:{mm}:{ss}" if hh != '00' else f"{mm}:{ss}"
 
 
+def time_to_seconds(time: str) -> int:
+    """Преобразует строку времени формата hh:mm:ss или hh:mm в количество секунд от начала суток."""
+    parts: List[str] = time.split(':')
+    return int(parts[0]) * 3600 + int(parts[1]) * 60 + (int(parts[2]) if len(parts) > 2 else 0)
+
+
+def days_to_mask(days: str) -> int:
+    """Преобразует строку с номерами дней недели в битовую маску (бит 0 - понедельник)."""
+    mask: int = 0
+    for d in days:
+        if '1' <= d <= '7':
+            mask |= 1 << (int(d) - 1)
+    return mask
+
+
+def compile_schedule(times: Iterable[str], days: str) -> tuple[array, int]:
+    """Возвращает отсортированный массив секунд звонков без повторов и маску дней расписания."""
+    return array('i', sorted({time_to_seconds(t) for t in times})), days_to_mask(days)
+
+
 def resource_path(relative_path: str) -> str:
     """Возвращает абсолютный путь к ресурсу, учитывая упаковку PyInstaller."""
     return join(getattr(sys, '_MEIPASS', dirname(abspath(sys.argv[0]))), relative_path)
 
 
-def is_already_running() -> bool:
-    """Проверяет, запущена ли уже другая копия приложения."""
-    current_pid: int = getpid()
-    script_name: str = basename(sys.argv[0])
-    count: int = 0
-    for proc in psutil.process_iter(['pid', 'name']):
+def send_to_running_instance(args: List[str]) -> bool:
+    """Передаёт аргументы запуска уже работающей копии программы. Возвращает False, если она не отвечает."""
+    from PyQt6.QtNetwork import QLocalSocket
+    socket: QLocalSocket = QLocalSocket()
+    socket.connectToServer(INSTANCE_NAME)
+    if not socket.waitForConnected(1000):
+        return False
+    socket.write(json.dumps(args, ensure_ascii=False).encode('utf-8'))
+    socket.waitForBytesWritten(1000)
+    socket.disconnectFromServer()
+    if socket.state() != QLocalSocket.LocalSocketState.UnconnectedState:
+        socket.waitForDisconnected(1000)
+    return True
+
+
+class InstanceServer(QObject):
+    """Сервер единственного экземпляра: принимает аргументы повторных запусков через локальный сокет."""
+    received: pyqtSignal = pyqtSignal(list)
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        from PyQt6.QtNetwork import QLocalServer
+        self.server: QLocalServer = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        # Сокет мог остаться после аварийного завершения; файл блокировки уже гарантирует, что копия одна
+        QLocalServer.removeServer(INSTANCE_NAME)
+        if not self.server.listen(INSTANCE_NAME):
+            logging.error('Instance server failed - ' + self.server.errorString())
+        self.server.newConnection.connect(self.on_connection)
+
+    def on_connection(self) -> None:
+        """Начинает приём сообщения от повторного запуска."""
+        while (socket := self.server.nextPendingConnection()) is not None:
+            buffer: bytearray = bytearray()
+            socket.readyRead.connect(lambda s=socket, b=buffer: b.extend(s.readAll().data()))
+            socket.disconnected.connect(lambda s=socket, b=buffer: self.on_message(s, b))
+
+    def on_message(self, socket: QLocalSocket, buffer: bytearray) -> None:
+        """Разбирает полученные аргументы и передаёт их в сигнал received."""
+        buffer.extend(socket.readAll().data())
+        socket.deleteLater()
         try:
-            if proc.info['name'] == script_name and proc.info['pid'] != current_pid:
-                count += 1
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
-    return count > 1
+            args: Any = json.loads(bytes(buffer).decode('utf-8'))
+        except ValueError:
+            logging.error('Invalid message from another instance')
+            return
+        if isinstance(args, list):
+            self.received.emit([str(x) for x in args])
 
 
 class DaysCheckBox(QCheckBox):
@@ -112,6 +630,185 @@ class DaysWidget(QWidget):
         return s
 
 
+TIME_PATTERN: str = r'(?:[01]\d|2[0-3]):[0-5]\d(?::[0-5]\d)?'
+WEEKDAY_NAMES: Dict[str, str] = {
+    'пн': '1', 'вт': '2', 'ср': '3', 'чт': '4', 'пт': '5', 'сб': '6', 'вс': '7',
+    'пон': '1', 'вто': '2', 'сре': '3', 'чет': '4', 'пят': '5', 'суб': '6', 'вос': '7',
+    'mo': '1', 'tu': '2', 'we': '3', 'th': '4', 'fr': '5', 'sa': '6', 'su': '7',
+    'mon': '1', 'tue': '2', 'wed': '3', 'thu': '4', 'fri': '5', 'sat': '6', 'sun': '7'}
+
+
+def parse_days(text: str) -> str:
+    """Разбирает дни недели из цифр 1-7 или сокращений (пн, вт... / MO, TU...), допускаются диапазоны вида пн-пт."""
+    text = ''.join(WEEKDAY_NAMES.get(w[:3], w) for w in findall(r'\w+|\W', text.lower()))
+    days: set[str] = set()
+    for first, last in findall(r'([1-7])\s*-\s*([1-7])', text):
+        days.update(str(d) for d in range(int(first), int(last) + 1))
+    days.update(c for c in text if c in '1234567')
+    return ''.join(sorted(days))
+
+
+class TimetableImport:
+    """Результат разбора файла расписания: расписания по имени и дням и разовые элементы по времени."""
+
+    def __init__(self, name: str, sound: str = '') -> None:
+        self.name: str = name
+        self.sound: str = sound
+        self.groups: Dict[tuple[str, str], set[str]] = {}
+        self.timed: List[Dict[str, str]] = []
+        self.timed_keys: set[tuple[str, str, str]] = set()
+        self.skipped: int = 0
+
+    def add_time(self, name: str, days: str, time: str) -> None:
+        """Добавляет время в расписание; повторы отбрасываются, неверные значения считаются пропущенными."""
+        if not days or not findall(f'^{TIME_PATTERN}$', time):
+            self.skipped += 1
+            return
+        self.groups.setdefault((name or self.name, days), set()).add(time if len(time) == 8 else time + ':00')
+
+    def add_timed(self, date: str, time: str) -> None:
+        """Добавляет разовый элемент по времени со звуком, выбранным для импорта."""
+        if not self.sound:
+            self.skipped += 1
+            return
+        if (key := (self.sound, time, date)) not in self.timed_keys:
+            self.timed_keys.add(key)
+            self.timed.append({'file': self.sound, 'time': time, 'days': date, 'zone': ''})
+
+    def schedules(self) -> List[tuple[str, List[str], str]]:
+        """Возвращает расписания (имя, времена, дни); одно имя с разными днями разводится по именам с днями."""
+        names: Dict[str, int] = {}
+        for name, _ in self.groups:
+            names[name] = names.get(name, 0) + 1
+        return [(name if names[name] == 1 else f'{name} ({days})', sorted(times), days)
+                for (name, days), times in self.groups.items()]
+
+
+def import_text_lines(lines: Iterable[str], result: TimetableImport) -> None:
+    """Собирает все времена из текста в одно расписание на будние дни и субботу."""
+    for line in lines:
+        for time in findall(TIME_PATTERN, line):
+            result.add_time('', '123456', time)
+
+
+def import_csv_lines(lines: Iterable[str], result: TimetableImport) -> None:
+    """Разбирает CSV: столбцы расписания, дней и времени находятся по заголовку, без заголовка берутся все времена."""
+    import csv
+    lines = iter(lines)
+    first: str = next(lines, '')
+    reader: Any = csv.reader(chain([first], lines), delimiter=';' if first.count(';') > first.count(',') else ',')
+    columns: Dict[str, int] = {}
+    for row in reader:
+        if not columns and not any(findall(TIME_PATTERN, cell) for cell in row):
+            for i, cell in enumerate(row):
+                key: str = cell.strip().lower()
+                for column, titles in (('name', ('schedule', 'name', 'расписание', 'название')),
+                                       ('days', ('days', 'дни')), ('time', ('time', 'время', 'start', 'начало'))):
+                    if key in titles:
+                        columns[column] = i
+            continue
+        name: str = row[columns['name']].strip() if 'name' in columns and columns['name'] < len(row) else ''
+        days: str = parse_days(row[columns['days']]) if 'days' in columns and columns['days'] < len(row) else '123456'
+        cells: List[str] = [row[columns['time']]] if 'time' in columns and columns['time'] < len(row) else row
+        for cell in cells:
+            for time in findall(TIME_PATTERN, cell):
+                result.add_time(name, days, time)
+
+
+def ics_datetime(value: str) -> Optional[datetime]:
+    """Разбирает DATE-TIME iCalendar в местное время; UTC (Z) переводится в местный пояс, TZID считается местным."""
+    try:
+        if value.endswith('Z'):
+            return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc).astimezone()
+        return datetime.strptime(value, '%Y%m%dT%H%M%S')
+    except ValueError:
+        return None
+
+
+def import_ics_lines(lines: Iterable[str], result: TimetableImport) -> None:
+    """Разбирает iCalendar построчно: повторяющиеся события становятся расписаниями по дням недели
+    (звонки на начало и конец события), разовые - элементами по времени, события на весь день пропускаются.
+    """
+    event: Optional[Dict[str, str]] = None
+    previous: Optional[str] = None
+
+    def handle(line: str) -> None:
+        nonlocal event
+        key, _, value = line.partition(':')
+        name: str = key.split(';')[0].upper()
+        if name == 'BEGIN' and value.strip().upper() == 'VEVENT':
+            event = {}
+        elif name == 'END' and value.strip().upper() == 'VEVENT' and event is not None:
+            add_event(event)
+            event = None
+        elif event is not None:
+            event[name] = value.strip()
+
+    def add_event(ev: Dict[str, str]) -> None:
+        start: Optional[datetime] = ics_datetime(ev.get('DTSTART', ''))
+        if start is None:
+            result.skipped += 1
+            return
+        end: Optional[datetime] = ics_datetime(ev.get('DTEND', ''))
+        summary: str = ev.get('SUMMARY', '').replace('\\,', ',')
+        if 'RRULE' in ev:
+            rule: Dict[str, str] = dict(p.split('=', 1) for p in ev['RRULE'].split(';') if '=' in p)
+            if rule.get('FREQ') == 'DAILY' and 'BYDAY' not in rule:
+                days: str = '1234567'
+            else:
+                days = parse_days(rule.get('BYDAY', '').replace(',', ' ')) or str(start.isoweekday())
+            for moment in (start, end):
+                if moment is not None:
+                    result.add_time('', days, moment.strftime('%H:%M:%S'))
+        else:
+            result.add_timed(start.strftime('%d.%m.%Y'), start.strftime('%H:%M:%S'))
+            if summary:
+                logging.info(f'Imported one-off event {summary} at {start}')
+
+    for raw in lines:
+        line: str = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and previous is not None:
+            previous += line[1:]  # Продолжение свёрнутой строки
+            continue
+        if previous is not None:
+            handle(previous)
+        previous = line
+    if previous is not None:
+        handle(previous)
+
+
+def import_timetable(path: str, result: TimetableImport) -> TimetableImport:
+    """Читает файл расписания построчно, формат определяется по расширению."""
+    parser: Callable[[Iterable[str], TimetableImport], None] = {
+        '.csv': import_csv_lines, '.ics': import_ics_lines}.get(splitext(path)[1].lower(), import_text_lines)
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+        parser(f, result)
+    return result
+
+
+class TimetableImporter(QObject):
+    """Разбирает файл расписания в фоновом потоке."""
+    finished: pyqtSignal = pyqtSignal(object)
+    failed: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, path: str, result: TimetableImport, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.path: str = path
+        self.result: TimetableImport = result
+
+    def start(self) -> None:
+        """Запускает разбор."""
+        threading.Thread(target=self.run, name='timetable-import', daemon=True).start()
+
+    def run(self) -> None:
+        try:
+            self.finished.emit(import_timetable(self.path, self.result))
+        except Exception as e:
+            # Любая ошибка разбора должна дойти до диалога, иначе он останется заблокированным
+            logging.exception('Timetable parser failed')
+            self.failed.emit(str(e) or type(e).__name__)
+
+
 class ImportText(QDialog):
     """Диалог для импорта расписания из текста."""
 
@@ -134,13 +831,72 @@ class ImportText(QDialog):
         self.enter_btn.clicked.connect(self.enter)
         self.layout.addWidget(self.enter_btn)
 
+        self.file_btn: QPushButton = QPushButton('Из файла (CSV, iCalendar, текст)...', self)
+        self.file_btn.clicked.connect(self.open_file)
+        self.layout.addWidget(self.file_btn)
+
+        self.sound: str = ''
+        self.sound_btn: QPushButton = QPushButton('Звук для разовых событий...', self)
+        self.sound_btn.clicked.connect(self.choose_sound)
+        self.layout.addWidget(self.sound_btn)
+
+        self.result: Optional[TimetableImport] = None
+        self.importer: Optional[TimetableImporter] = None
+
     def enter(self):
         if self.name.text():
             self.accept()
 
-    def output(self) -> tuple[str, List[str]]:
-        """Возвращает имя и отсортированный список времен из текстового поля."""
-        return self.name.text(), sorted(findall(r'(?:[01]\d|2[0-3]):[0-5]\d(?::[0-5]\d)?', self.textarea.toPlainText()))
+    def choose_sound(self) -> None:
+        """Выбирает звук для разовых событий из iCalendar."""
+        path, _ = QFileDialog.getOpenFileName(self, 'Звук для разовых событий', '', SUPPORTED_FILES)
+        if path:
+            self.sound = path
+            self.sound_btn.setText(basename(path))
+
+    def open_file(self) -> None:
+        """Разбирает выбранный файл расписания в фоновом потоке, не блокируя окно."""
+        path, _ = QFileDialog.getOpenFileName(self, 'Импорт расписания', '',
+                                              'Расписания (*.csv *.ics *.txt);;Все файлы (*)')
+        if not path:
+            return
+        if not self.name.text():
+            self.name.setText(splitext(basename(path))[0])
+        for w in (self.file_btn, self.enter_btn, self.textarea):
+            w.setEnabled(False)
+        self.file_btn.setText('Разбор файла...')
+        self.importer = TimetableImporter(path, TimetableImport(self.name.text(), self.sound), self)
+        self.importer.finished.connect(self.on_imported)
+        self.importer.failed.connect(self.on_failed)
+        self.importer.start()
+
+    def on_imported(self, result: TimetableImport) -> None:
+        """Принимает результат разбора файла; если диалог уже закрыт, результат отбрасывается."""
+        if not self.isVisible():
+            return
+        self.result = result
+        logging.info(f'Parsed timetable: {len(result.groups)} schedules, {len(result.timed)} timed items, '
+                     f'{result.skipped} skipped')
+        if result.skipped:
+            QMessageBox.warning(self, 'Импорт расписания', f'Пропущено записей: {result.skipped}')
+        self.accept()
+
+    def on_failed(self, error: str) -> None:
+        """Сообщает об ошибке чтения файла."""
+        logging.error(f'Timetable import failed: {error}')
+        QMessageBox.critical(self, 'Импорт расписания', f'Не удалось прочитать файл:\n{error}')
+        for w in (self.file_btn, self.enter_btn, self.textarea):
+            w.setEnabled(True)
+        self.file_btn.setText('Из файла (CSV, iCalendar, текст)...')
+
+    def output(self) -> Optional[TimetableImport]:
+        """Возвращает результат разбора файла или времена из текстового поля."""
+        if self.result is not None or not self.name.text():
+            return self.result
+        result: TimetableImport = TimetableImport(self.name.text())
+        import_text_lines(self.textarea.toPlainText().splitlines(), result)
+        result.groups.setdefault((result.name, '123456'), set())
+        return result
 
 
 class Delegate(QStyledItemDelegate):
@@ -163,13 +919,478 @@ class Delegate(QStyledItemDelegate):
             option.text = f"{index.row() + 1}. {option.text}"
 
 
-class PlaylistItem(QListWidgetItem):
-    """Элемент плейлиста с URL трека."""
+# Сигнатуры начала файлов поддерживаемых контейнеров: (смещение, байты)
+MEDIA_SIGNATURES: tuple[tuple[int, bytes], ...] = (
+    (0, b'ID3'), (0, b'RIFF'), (0, b'OggS'), (0, b'fLaC'), (4, b'ftyp'), (0, b'\x1a\x45\xdf\xa3'),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'), (0, b'FLV'), (0, b'\x00\x00\x01\xba'), (0, b'\x00\x00\x01\xb3'),
+    (0, b'\x0b\x77'), (0, b'MAC '), (0, b'FORM'), (0, b'.ra\xfd'), (0, b'.RMF'), (0, b'RF64'), (0, b'BW64'),
+    (4, b'moov'), (4, b'mdat'), (4, b'wide'), (4, b'free'), (4, b'skip'), (4, b'pnot'),
+)
+
+
+def sniff_media(head: bytes) -> Optional[bool]:
+    """Проверяет по первым байтам файла, похож ли он на поддерживаемый аудио- или видеоконтейнер.
+
+    Возвращает True для известного заголовка, False для пустого файла и None, если заголовок
+    не распознан: такой файл может оказаться воспроизводимым (например, MP3 с мусором в начале).
+    """
+    if not head:
+        return False
+    if len(head) >= 2 and head[0] == 0xff and head[1] & 0xe0 == 0xe0:  # Кадр MPEG audio или ADTS
+        return True
+    return True if any(head[offset:offset + len(sig)] == sig for offset, sig in MEDIA_SIGNATURES) else None
+
+
+def probe_media(path: str) -> Dict[str, Any]:
+    """Собирает сведения о медиафайле: размер, время изменения, поддерживаемость формата (None - неизвестно).
+
+    Если установлен mutagen, дополнительно читаются длительность (мс) и теги.
+    """
+    st: Any = stat(path)
+    info: Dict[str, Any] = {'size': st.st_size, 'mtime': st.st_mtime, 'valid': None, 'duration': None}
+    with open(path, 'rb') as f:
+        info['valid'] = sniff_media(f.read(16))
+    try:
+        import mutagen
+    except ImportError:
+        return info
+    try:
+        media: Any = mutagen.File(path, easy=True)
+    except Exception:
+        return info
+    if media is not None:
+        info['valid'] = True
+        if getattr(media.info, 'length', None):
+            info['duration'] = int(media.info.length * 1000)
+        for tag in ('title', 'artist'):
+            if media.tags and tag in media.tags:
+                info[tag] = str(media.tags[tag][0])
+    return info
+
+
+LOUDNESS_TARGET: float = -18.0  # LUFS, опорный уровень ReplayGain 2.0
+LOUDNESS_RATE: int = 22050
+
+
+def decode_pcm(path: str) -> Optional[tuple[bytes, int, int]]:
+    """Декодирует файл в PCM s16le и возвращает (данные, частота, каналы).
+
+    Используется ffmpeg из PATH (моно, 22050 Гц); без него читаются только 16-битные WAV.
+    """
+    if (ffmpeg := which('ffmpeg')) is not None:
+        import subprocess
+        result: subprocess.CompletedProcess = subprocess.run(
+            [ffmpeg, '-v', 'error', '-i', path, '-vn', '-ac', '1', '-ar', str(LOUDNESS_RATE), '-f', 's16le', '-'],
+            capture_output=True, timeout=600, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        return (result.stdout, LOUDNESS_RATE, 1) if result.returncode == 0 and result.stdout else None
+    if path.lower().endswith('.wav'):
+        import wave
+        with wave.open(path, 'rb') as w:
+            if w.getsampwidth() == 2:
+                return w.readframes(w.getnframes()), w.getframerate(), w.getnchannels()
+    return None
+
+
+def measure_loudness(path: str) -> Optional[float]:
+    """Вычисляет интегральную громкость трека в LUFS по ITU-R BS.1770 (блоки 400 мс, стробирование -70 и -10 LU).
+
+    K-фильтр не применяется, поэтому значение приблизительное, но для выравнивания треков между собой его хватает.
+    """
+    import numpy as np
+    if (pcm := decode_pcm(path)) is None:
+        return None
+    data, rate, channels = pcm
+    samples: Any = np.frombuffer(data[:len(data) // (2 * channels) * 2 * channels], dtype='<i2')
+    power: Any = (samples.astype(np.float32).reshape(-1, channels) / 32768) ** 2
+    power = power.sum(axis=1)
+    block: int = int(rate * 0.4)
+    if len(power) < block:
+        return None
+    cumulative: Any = np.concatenate(([0.0], np.cumsum(power, dtype=np.float64)))
+    starts: Any = np.arange(0, len(power) - block + 1, block // 4)
+    blocks: Any = (cumulative[starts + block] - cumulative[starts]) / block
+    loudness: Any = -0.691 + 10 * np.log10(np.maximum(blocks, 1e-12))
+    blocks, loudness = blocks[loudness > -70], loudness[loudness > -70]
+    if not blocks.size:
+        return None
+    relative: float = -0.691 + 10 * np.log10(blocks.mean()) - 10
+    return float(-0.691 + 10 * np.log10(blocks[loudness > relative].mean()))
+
+
+def measure_many(paths: List[str]) -> List[tuple[str, Optional[float]]]:
+    """Измеряет громкость пачки файлов (выполняется в отдельном процессе)."""
+    results: List[tuple[str, Optional[float]]] = []
+    for path in paths:
+        try:
+            results.append((path, measure_loudness(path)))
+        except Exception as e:
+            logging.warning(f'Loudness analysis failed for {path} - {e}')
+            results.append((path, None))
+    return results
+
 
-    def __init__(self, url: str, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
-        self.url: str = url
-        self.setText(url.rsplit('/', maxsplit=1)[1])
+class MediaCache(QObject):
+    """Кэш сведений о медиафайлах по пути, размеру и времени изменения.
+
+    Файлы проверяются пулом потоков в фоне, результаты сохраняются в ~/.zvonki2/media_cache.json,
+    поэтому при следующем запуске неизменённые файлы повторно не читаются.
+    """
+    updated: pyqtSignal = pyqtSignal()
+    changed: pyqtSignal = pyqtSignal(list)  # Пути, сведения о которых изменились с прошлого updated
+    probed: pyqtSignal = pyqtSignal(str, dict)
+
+    CHUNK: int = 256
+
+    def __init__(self, path: str, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.path: str = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.lock: threading.Lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.dirty: set[str] = set()
+
+        self.probed.connect(self.on_probed, Qt.ConnectionType.QueuedConnection)
+        self.flush_timer: QTimer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(1000)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сведения о файле, если они уже известны."""
+        return self.entries.get(path)
+
+    def playable(self, path: str) -> bool:
+        """Возвращает False, только если файл отсутствует или его уже не смог открыть плеер.
+
+        Заключение по заголовку файла не учитывается: оно бывает ошибочным, а плеер разберётся сам.
+        """
+        return (info := self.entries.get(path)) is None or not (info.get('missing') or info.get('broken'))
+
+    def request(self, paths: List[str]) -> None:
+        """Ставит файлы в очередь фоновой проверки."""
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='media-probe')
+        for i in range(0, len(paths), self.CHUNK):
+            self.executor.submit(self.check, paths[i:i + self.CHUNK])
+
+    def check(self, paths: List[str]) -> None:
+        """Проверяет файлы (выполняется в пуле потоков), изменённые и новые передаёт в on_probed."""
+        for path in paths:
+            with self.lock:
+                cached: Optional[Dict[str, Any]] = self.entries.get(path)
+            try:
+                st: Any = stat(path)
+            except OSError:
+                if cached is None or not cached.get('missing'):
+                    self.probed.emit(path, {'size': -1, 'mtime': 0, 'valid': False, 'duration': None,
+                                            'missing': True})
+                continue
+            if cached is not None and cached['size'] == st.st_size and cached['mtime'] == st.st_mtime:
+                continue
+            try:
+                info: Dict[str, Any] = probe_media(path)
+            except OSError:
+                info = {'size': st.st_size, 'mtime': st.st_mtime, 'valid': False, 'duration': None}
+            self.probed.emit(path, info)
+
+    def on_probed(self, path: str, info: Dict[str, Any]) -> None:
+        """Сохраняет результат проверки в потоке интерфейса."""
+        with self.lock:
+            self.entries[path] = info
+        self.dirty.add(path)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def set_duration(self, path: str, duration: int) -> None:
+        """Запоминает длительность, которую сообщил плеер при загрузке файла."""
+        if (entry := self.entries.get(path)) is not None and entry['duration'] != duration:
+            self.on_probed(path, {**entry, 'duration': duration, 'valid': True, 'broken': False})
+
+    def set_loudness(self, path: str, loudness: Optional[float]) -> None:
+        """Запоминает измеренную громкость; None означает, что файл измерить не удалось."""
+        if (entry := self.entries.get(path)) is not None:
+            self.on_probed(path, {**entry, 'loudness': loudness})
+
+    def gain(self, path: str) -> float:
+        """Возвращает множитель громкости, приводящий трек к LOUDNESS_TARGET (от -12 до +6 дБ)."""
+        if (entry := self.entries.get(path)) is None or entry.get('loudness') is None:
+            return 1.0
+        return 10 ** (min(6.0, max(-12.0, LOUDNESS_TARGET - entry['loudness'])) / 20)
+
+    def mark_invalid(self, path: str) -> None:
+        """Отмечает файл, который плеер не смог открыть; такой файл пропускается до его изменения."""
+        if (entry := self.entries.get(path)) is not None and not entry.get('broken'):
+            self.on_probed(path, {**entry, 'valid': False, 'broken': True})
+
+    def flush(self) -> None:
+        """Сообщает об обновлении и сохраняет кэш на диск в фоне."""
+        dirty: List[str] = list(self.dirty)
+        self.dirty.clear()
+        self.updated.emit()
+        self.changed.emit(dirty)
+        if self.executor is not None:
+            with self.lock:
+                snapshot: Dict[str, Dict[str, Any]] = dict(self.entries)
+            self.executor.submit(lambda: write_atomic(self.path, json.dumps(snapshot, ensure_ascii=False)))
+
+    def shutdown(self) -> None:
+        """Отменяет незавершённые проверки."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LoudnessAnalyzer(QObject):
+    """Фоновое измерение громкости треков пулом процессов.
+
+    Файлы отдаются пулу пачками, следующая пачка уходит по готовности предыдущей, поэтому большую
+    фонотеку можно обрабатывать постепенно. Результаты хранятся в кэше медиафайлов.
+    """
+    measured: pyqtSignal = pyqtSignal(list)
+
+    BATCH_SIZE: int = 4
+
+    def __init__(self, cache: MediaCache, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.cache: MediaCache = cache
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.workers: int = max(1, min(2, (cpu_count() or 2) - 1))
+        self.pending: deque[str] = deque()
+        self.queued: set[str] = set()
+        self.running: int = 0
+        self.available: Optional[bool] = None
+        self.measured.connect(self.on_measured, Qt.ConnectionType.QueuedConnection)
+
+    def analyze(self, paths: Iterable[str]) -> None:
+        """Ставит в очередь проверенные кэшем файлы, громкость которых ещё не измерена."""
+        if not config['normalize']:
+            return
+        if self.available is None:
+            self.available = find_spec('numpy') is not None
+            if not self.available:
+                logging.warning('NumPy is not installed, loudness normalization disabled')
+        if not self.available:
+            return
+        for path in paths:
+            info: Optional[Dict[str, Any]] = self.cache.get(path)
+            if path not in self.queued and info is not None and info['valid'] is not False and 'loudness' not in info:
+                self.queued.add(path)
+                self.pending.append(path)
+        self.submit()
+
+    def submit(self) -> None:
+        """Отдаёт пулу новые пачки, пока есть свободные процессы."""
+        while self.pending and self.running < self.workers:
+            if self.executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            batch: List[str] = [self.pending.popleft() for _ in range(min(self.BATCH_SIZE, len(self.pending)))]
+            self.executor.submit(measure_many, batch).add_done_callback(self.done)
+            self.running += 1
+
+    def done(self, future: Future) -> None:
+        """Передаёт результаты пачки в поток интерфейса (вызывается потоком пула)."""
+        try:
+            self.measured.emit(future.result())
+        except Exception as e:
+            logging.warning('Loudness batch failed - ' + str(e))
+            self.measured.emit([])
+
+    def on_measured(self, results: List[tuple[str, Optional[float]]]) -> None:
+        """Сохраняет результаты пачки и запускает следующую."""
+        self.running -= 1
+        for path, loudness in results:
+            self.queued.discard(path)
+            self.cache.set_loudness(path, loudness)
+        self.submit()
+
+    def shutdown(self) -> None:
+        """Останавливает пул, не дожидаясь незавершённых измерений."""
+        self.pending.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FolderScanner(QObject):
+    """Рекурсивно обходит папки в фоновом потоке и передаёт найденные медиафайлы пачками."""
+    batch: pyqtSignal = pyqtSignal(list)
+    progress: pyqtSignal = pyqtSignal(int, int)
+    finished: pyqtSignal = pyqtSignal(int)
+
+    BATCH_SIZE: int = 500
+    BATCH_INTERVAL: float = 0.25
+
+    def __init__(self, roots: List[str], parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.roots: List[str] = roots
+        self.cancelled: threading.Event = threading.Event()
+        self.thread: threading.Thread = threading.Thread(target=self.run, name='folder-scan', daemon=True)
+
+    def start(self) -> None:
+        """Запускает обход."""
+        self.thread.start()
+
+    def cancel(self) -> None:
+        """Прерывает обход; уже переданные пачки остаются в плейлисте."""
+        self.cancelled.set()
+
+    def run(self) -> None:
+        """Обходит папки в глубину, по каждой папке файлы и подпапки идут по алфавиту."""
+        found: List[str] = []
+        total: int = 0
+        folders: int = 0
+        last: float = monotonic()
+        stack: List[str] = list(reversed(self.roots))
+        while stack and not self.cancelled.is_set():
+            folder: str = stack.pop()
+            folders += 1
+            try:
+                with scandir(folder) as it:
+                    entries: List[Any] = sorted(it, key=lambda e: e.name.lower())
+            except OSError as e:
+                logging.warning(f'Cannot scan folder {folder} - {e}')
+                continue
+            subfolders: List[str] = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
+                    elif splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS and entry.is_file():
+                        found.append(entry.path.replace('\\', '/'))
+                except OSError:
+                    continue
+            stack.extend(reversed(subfolders))
+            if len(found) >= self.BATCH_SIZE or found and monotonic() - last >= self.BATCH_INTERVAL:
+                total += len(found)
+                self.batch.emit(found)
+                self.progress.emit(folders, total)
+                found, last = [], monotonic()
+        if found and not self.cancelled.is_set():
+            total += len(found)
+            self.batch.emit(found)
+        self.progress.emit(folders, total)
+        self.finished.emit(total)
+
+
+class PlaylistModel(QAbstractListModel):
+    """Модель плейлиста поверх списка путей config['playlist'].
+
+    Список используется напрямую, поэтому изменения через модель сразу видны в конфигурации.
+    """
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        # Сразу общий список: треки, добавленные до отложенной загрузки, не должны теряться
+        self.paths: List[str] = config['playlist']
+        self.media: Optional[MediaCache] = None
+
+    def set_paths(self, paths: List[str]) -> None:
+        """Подключает модель к новому списку путей."""
+        self.beginResetModel()
+        self.paths = paths
+        self.endResetModel()
+
+    def path(self, row: int) -> str:
+        """Возвращает путь трека в строке row."""
+        return self.paths[row]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        path: str = self.paths[index.row()]
+        info: Optional[Dict[str, Any]] = self.media.get(path) if self.media is not None else None
+        if role == Qt.ItemDataRole.DisplayRole:
+            name: str = path.rsplit('/', maxsplit=1)[-1]
+            return f"{name} [{mseconds_to_time(info['duration'])}]" if info and info['duration'] else name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if info and info.get('missing'):
+                return path + '\nФайл не найден'
+            if info and info['valid'] is False:
+                return path + '\nФормат файла не поддерживается'
+            if info and info.get('title'):
+                return f"{path}\n{info.get('artist', '')} - {info['title']}"
+            return path
+        if role == Qt.ItemDataRole.ForegroundRole and info and info['valid'] is False:
+            return QColor(192, 0, 0)
+        return None
+
+    def refresh(self) -> None:
+        """Перерисовывает строки после обновления сведений о файлах."""
+        if self.paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self.paths) - 1))
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsDragEnabled
+
+    def supportedDropActions(self) -> Qt.DropAction:
+        return Qt.DropAction.MoveAction
+
+    def moveRows(self, source_parent: QModelIndex, source_row: int, count: int,
+                 destination_parent: QModelIndex, destination_child: int) -> bool:
+        """Перемещает строки внутри списка (перетаскивание в представлении)."""
+        if source_parent.isValid() or destination_parent.isValid():
+            return False
+        return self.move_rows(source_row, count, destination_child)
+
+    def move_rows(self, row: int, count: int, destination: int) -> bool:
+        """Перемещает count строк начиная с row перед строкой destination (номер до перемещения)."""
+        if count <= 0 or row <= destination <= row + count:
+            return False
+        if not self.beginMoveRows(QModelIndex(), row, row + count - 1, QModelIndex(), destination):
+            return False
+        moved: List[str] = self.paths[row:row + count]
+        del self.paths[row:row + count]
+        if destination > row:
+            destination -= count
+        self.paths[destination:destination] = moved
+        self.endMoveRows()
+        return True
+
+    def append(self, paths: List[str]) -> None:
+        """Добавляет треки в конец плейлиста."""
+        if paths:
+            self.beginInsertRows(QModelIndex(), len(self.paths), len(self.paths) + len(paths) - 1)
+            self.paths.extend(paths)
+            self.endInsertRows()
+
+    def remove_rows(self, rows: List[int]) -> None:
+        """Удаляет строки, rows должны идти по убыванию.
+
+        Соседние строки удаляются одним диапазоном, при большом числе разрозненных строк
+        список пересобирается за один проход со сбросом модели.
+        """
+        ranges: List[tuple[int, int]] = []
+        for row in rows:
+            if ranges and ranges[-1][0] == row + 1:
+                ranges[-1] = (row, ranges[-1][1])
+            else:
+                ranges.append((row, row))
+        if len(ranges) > 64:
+            removed: set[int] = set(rows)
+            self.beginResetModel()
+            self.paths[:] = [x for i, x in enumerate(self.paths) if i not in removed]
+            self.endResetModel()
+            return
+        for first, last in ranges:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.paths[first:last + 1]
+            self.endRemoveRows()
+
+    def clear(self) -> None:
+        """Удаляет все треки."""
+        self.beginResetModel()
+        self.paths.clear()
+        self.endResetModel()
 
 
 class PlaylistWidget(QDockWidget):
@@ -181,11 +1402,15 @@ class PlaylistWidget(QDockWidget):
         self.setWindowTitle('Плейлист')
         self.setMinimumWidth(300)
 
-        self.table: QListWidget = QListWidget(self)
-        self.table.setMovement(QListWidget.Movement.Snap)
-        self.table.setDragDropMode(QListWidget.DragDropMode.InternalMove)
+        self.model: PlaylistModel = PlaylistModel(self)
+        self.model.rowsMoved.connect(self.save_moved)
+
+        self.table: QListView = QListView(self)
+        self.table.setModel(self.model)
+        self.table.setUniformItemSizes(True)
+        self.table.setMovement(QListView.Movement.Snap)
+        self.table.setDragDropMode(QListView.DragDropMode.InternalMove)
         self.table.doubleClicked.connect(self.double_song)
-        self.table.model().rowsMoved.connect(self.save_list)
         self.table.contextMenuEvent = self.right_clicked
 
         self.delegate: Delegate = Delegate(self.table)
@@ -195,21 +1420,42 @@ class PlaylistWidget(QDockWidget):
         self.setAllowedAreas(Qt.DockWidgetArea.TopDockWidgetArea)
         self.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable)
 
-    def save_list(self) -> None:
-        """Сохраняет текущий порядок плейлиста в конфигурацию."""
-        config['playlist'] = [self.table.item(i).url for i in range(self.table.count())]
-        save_config()
+    def count(self) -> int:
+        """Возвращает количество треков."""
+        return self.model.rowCount()
+
+    def current_row(self) -> int:
+        """Возвращает номер текущего трека или -1."""
+        return self.table.currentIndex().row()
+
+    def save_moved(self, parent: QModelIndex, start: int, end: int, destination: QModelIndex, row: int) -> None:
+        """Сохраняет перемещение строк: меняется только диапазон между старым и новым местом."""
+        storage.playlist_moved(min(start, row), max(end + 1, row))
+
+    def add_items(self, urls: List[str]) -> None:
+        """Добавляет треки в конец плейлиста одной операцией и сохраняет их одним вызовом."""
+        if urls:
+            self.model.append(urls)
+            storage.playlist_added(urls)
 
-    def add_item(self, url: str) -> None:
-        """Добавляет новый элемент в плейлист."""
-        self.table.addItem(PlaylistItem(url))
+    def remove_rows(self, rows: List[int]) -> None:
+        """Удаляет строки из плейлиста одной операцией и сохраняет изменения одним вызовом."""
+        rows = sorted(set(rows), reverse=True)
+        if rows:
+            self.model.remove_rows(rows)
+            storage.playlist_removed(rows)
+
+    def clear(self) -> None:
+        """Очищает плейлист."""
+        self.model.clear()
+        storage.playlist_reset()
 
     def right_clicked(self, event: Any) -> None:
         """Обработчик правого клика для вызова контекстного меню."""
         menu: QMenu = QMenu(self.table)
-        if (x := self.table.itemAt(event.pos())) is not None:
+        if (x := self.table.indexAt(event.pos())).isValid():
             delete: QAction = QAction('Удалить', self.table)
-            delete.triggered.connect(lambda: self.delete(x))
+            delete.triggered.connect(lambda: self.delete(x.row()))
             menu.addAction(delete)
         add: QAction = QAction('Добавить', self.table)
         add.triggered.connect(self.parent.open_songs)
@@ -217,27 +1463,27 @@ class PlaylistWidget(QDockWidget):
         menu.popup(self.cursor().pos())
         event.accept()
 
-    def delete(self, song: PlaylistItem) -> None:
+    def delete(self, row: int) -> None:
         """Удаляет трек из плейлиста."""
-        config['playlist'].remove(song.url)
-        self.table.takeItem(self.table.row(song))
+        self.remove_rows([row])
 
     def double_song(self, ind: Any) -> None:
         """Обрабатывает двойной клик по треку."""
         self.table.setCurrentIndex(ind)
         self.delegate.set_current(ind.row())
-        self.update()
+        self.table.viewport().update()
         self.parent.player.setSource(QUrl(self.get_song()))
 
     def change_song(self, num: int) -> None:
         """Переключает текущий трек на указанный номер."""
-        self.table.setCurrentRow(num)
+        self.table.setCurrentIndex(self.model.index(num))
         self.delegate.set_current(num)
+        self.table.viewport().update()
         self.parent.player.setSource(QUrl(self.get_song()))
 
     def get_song(self) -> str:
         """Возвращает URL текущего трека."""
-        return self.table.currentItem().url
+        return self.model.path(self.current_row())
 
 
 class Settings(QDialog):
@@ -274,10 +1520,72 @@ class Settings(QDialog):
         self.autorun.clicked.connect(self.set_autorun)
         self.lay.addWidget(self.autorun)
 
+        self.sqlite: QCheckBox = QCheckBox('Хранение в базе SQLite', self)
+        self.sqlite.setChecked(isinstance(storage, SqliteStorage))
+        self.sqlite.clicked.connect(self.set_sqlite)
+        self.lay.addWidget(self.sqlite)
+
+        self.bell_grace: QSpinBox = QSpinBox(self)
+        self.bell_grace.setRange(0, 300)
+        self.bell_grace.setValue(config['bell_grace'])
+        self.bell_grace.setPrefix('Допустимое опоздание звонка: ')
+        self.bell_grace.setSuffix('с')
+        self.bell_grace.valueChanged.connect(self.set_bell_grace)
+        self.lay.addWidget(self.bell_grace)
+
+        self.prearm: QSpinBox = QSpinBox(self)
+        self.prearm.setRange(0, 60)
+        self.prearm.setValue(config['prearm'])
+        self.prearm.setPrefix('Подготовка трека за: ')
+        self.prearm.setSuffix('с')
+        self.prearm.valueChanged.connect(self.set_prearm)
+        self.lay.addWidget(self.prearm)
+
+        self.bell_fade: QSpinBox = QSpinBox(self)
+        self.bell_fade.setRange(0, 10)
+        self.bell_fade.setValue(config['bell_fade'])
+        self.bell_fade.setPrefix('Затухание в конце звонка: ')
+        self.bell_fade.setSuffix('с')
+        self.bell_fade.valueChanged.connect(self.set_bell_fade)
+        self.lay.addWidget(self.bell_fade)
+
+        self.stall_threshold: QSpinBox = QSpinBox(self)
+        self.stall_threshold.setRange(0, 10000)
+        self.stall_threshold.setSingleStep(100)
+        self.stall_threshold.setValue(config['stall_threshold'])
+        self.stall_threshold.setPrefix('Записывать зависания дольше: ')
+        self.stall_threshold.setSuffix('мс')
+        self.stall_threshold.setSpecialValueText('Не записывать зависания')
+        self.stall_threshold.valueChanged.connect(self.set_stall_threshold)
+        self.lay.addWidget(self.stall_threshold)
+
+        self.sync_role: QComboBox = QComboBox(self)
+        for role, title in (('', 'Без синхронизации'), ('master', 'Ведущий узел сети'),
+                            ('follower', 'Ведомый узел сети')):
+            self.sync_role.addItem(title, role)
+        self.sync_role.setCurrentIndex(max(0, self.sync_role.findData(config['sync_role'])))
+        self.sync_role.currentIndexChanged.connect(self.set_sync)
+        self.lay.addWidget(self.sync_role)
+
+        self.sync_master: QLineEdit = QLineEdit(config['sync_master'], self)
+        self.sync_master.setPlaceholderText('Адрес ведущего узла')
+        self.sync_master.setEnabled(config['sync_role'] == 'follower')
+        self.sync_master.editingFinished.connect(self.set_sync)
+        self.lay.addWidget(self.sync_master)
+
+        self.zones: QPushButton = QPushButton('Зоны воспроизведения...', self)
+        self.zones.clicked.connect(lambda: ZonesDialog(self.parent).exec())
+        self.lay.addWidget(self.zones)
+
+        self.normalize: QCheckBox = QCheckBox('Выравнивание громкости треков', self)
+        self.normalize.setChecked(config['normalize'])
+        self.normalize.clicked.connect(self.set_normalize)
+        self.lay.addWidget(self.normalize)
+
     def sort_on_restart(self) -> None:
         """Обновляет настройку сортировки при запуске."""
         config['sort_restart'] = self.sort_restart.isChecked()
-        save_config()
+        storage.set_value('sort_restart')
 
     def top_hint_checked(self) -> None:
         """Обновляет настройку отображения окна поверх других."""
@@ -286,13 +1594,63 @@ class Settings(QDialog):
         self.parent.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint, self.top_hint.isChecked())
         self.parent.show()
         self.show()
-        save_config()
+        storage.set_value('top_hint')
 
     def docks_movable_checked(self) -> None:
         """Переключает возможность перемещения док-виджетов."""
         for dock in self.parent.findChildren(QDockWidget):
             dock.setFeatures(dock.features() ^ QDockWidget.DockWidgetFeature.DockWidgetFloatable)
 
+    def set_bell_grace(self) -> None:
+        """Обновляет допустимое опоздание звонка после блокировки интерфейса."""
+        config['bell_grace'] = self.bell_grace.value()
+        storage.set_value('bell_grace')
+
+    def set_prearm(self) -> None:
+        """Обновляет время заблаговременной загрузки трека перед звонком."""
+        config['prearm'] = self.prearm.value()
+        storage.set_value('prearm')
+        self.parent.timeline.invalidate()
+
+    def set_sync(self) -> None:
+        """Обновляет роль узла в сети и адрес ведущего; вступает в силу после перезапуска."""
+        changed: bool = config['sync_role'] != self.sync_role.currentData()
+        config['sync_role'] = self.sync_role.currentData()
+        config['sync_master'] = self.sync_master.text().strip()
+        self.sync_master.setEnabled(config['sync_role'] == 'follower')
+        storage.set_value('sync_role')
+        storage.set_value('sync_master')
+        if changed:
+            QMessageBox.information(self, 'Синхронизация', 'Изменения вступят в силу после перезапуска программы.')
+
+    def set_stall_threshold(self) -> None:
+        """Обновляет порог, начиная с которого зависание цикла событий записывается в stalls.log."""
+        config['stall_threshold'] = self.stall_threshold.value()
+        storage.set_value('stall_threshold')
+        self.parent.watchdog.restart()
+
+    def set_bell_fade(self) -> None:
+        """Обновляет длительность затухания звонка; действует со следующего звонка."""
+        config['bell_fade'] = self.bell_fade.value()
+        storage.set_value('bell_fade')
+
+    def set_normalize(self) -> None:
+        """Включает или выключает поправку громкости по измеренной громкости треков."""
+        config['normalize'] = self.normalize.isChecked()
+        storage.set_value('normalize')
+        self.parent.apply_volume()
+        self.parent.analyze_loudness()
+
+    def set_sqlite(self) -> None:
+        """Переносит конфигурацию в базу SQLite или обратно в config.json."""
+        import sqlite3
+        try:
+            switch_storage(self.sqlite.isChecked())
+        except (OSError, sqlite3.Error) as e:
+            logging.error('Failed to switch storage - ' + str(e))
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось перенести настройки: ' + str(e))
+            self.sqlite.setChecked(isinstance(storage, SqliteStorage))
+
     def set_autorun(self) -> None:
         """Управляет настройкой автозапуска приложения."""
         if sys.platform == 'win32':
@@ -305,7 +1663,7 @@ class Settings(QDialog):
                 DeleteValue(key, 'Zvonki2')
             key.Close()
         config['autorun'] = self.autorun.isChecked()
-        save_config()
+        storage.set_value('autorun')
         logging.info(f'Autorun {"enabled" if self.autorun.isChecked() else "disabled"}')
 
 
@@ -319,6 +1677,9 @@ class Actions(QMenuBar):
         self.add: QAction = QAction('Добавить', self)
         self.add.triggered.connect(self.parent.open_songs)
 
+        self.add_folder: QAction = QAction('Добавить папку', self)
+        self.add_folder.triggered.connect(self.parent.open_folder)
+
         self.remove_all: QAction = QAction('Удалить все', self)
         self.remove_all.triggered.connect(self.parent.delete_all)
 
@@ -331,8 +1692,14 @@ class Actions(QMenuBar):
         self.imps: QAction = QAction('Импорт из текста', self)
         self.imps.triggered.connect(self.parent.schedule.import_text)
 
+        self.calendar: QAction = QAction('Учебный календарь', self)
+        self.calendar.triggered.connect(lambda: CalendarDialog(self.parent).exec())
+
+        self.stats: QAction = QAction('Задержки звонков', self)
+        self.stats.triggered.connect(lambda: BellStatsDialog(self.parent.bell_stats, self.parent).exec())
+
         self.settings: QAction = QAction('Настройки', self)
-        self.settings.triggered.connect(self.parent.settings.exec)
+        self.settings.triggered.connect(self.parent.show_settings)
 
         self.by_alphabet: QAction = QAction('По алфавиту', self)
         self.by_alphabet.triggered.connect(self.parent.sort_by_alphabet)
@@ -342,6 +1709,7 @@ class Actions(QMenuBar):
 
         self.s_menu: QMenu = QMenu('Песни', self)
         self.s_menu.addAction(self.add)
+        self.s_menu.addAction(self.add_folder)
         self.s_menu.addAction(self.remove_all)
         self.addMenu(self.s_menu)
 
@@ -354,6 +1722,8 @@ class Actions(QMenuBar):
         self.sch_menu.addAction(self.adds)
         self.sch_menu.addAction(self.timed_add)
         self.sch_menu.addAction(self.imps)
+        self.sch_menu.addAction(self.calendar)
+        self.sch_menu.addAction(self.stats)
         self.addMenu(self.sch_menu)
 
         self.addAction(self.settings)
@@ -391,7 +1761,7 @@ class VolumeSlider(QDockWidget):
 
     def value_changed(self) -> None:
         """Обновляет громкость приложения и отображает значение."""
-        self.parent.audio.setVolume(self.slider.value() / 100)
+        self.parent.apply_volume()
         self.vol.setText(f'{self.slider.value()}%')
 
     def resizeEvent(self, event: Any) -> None:
@@ -405,13 +1775,18 @@ class SystemVolumeSlider(VolumeSlider):
     def __init__(self, parent: Optional[QWidget] = None) -> None:
         super().__init__(parent=parent)
         self.setWindowTitle('Системная громкость')
+        self.volume_object: Any = None
 
-        devices: Optional[AudioDevice] = AudioUtilities.GetSpeakers()
-        self.volume_object = devices.EndpointVolume
+    def connect_device(self) -> None:
+        """Подключается к системному устройству вывода (вызывается после показа окна, COM-вызовы медленные)."""
+        from pycaw.pycaw import AudioUtilities
+        self.volume_object = AudioUtilities.GetSpeakers().EndpointVolume
+        self.slider.setValue(int(round(self.volume_object.GetMasterVolumeLevelScalar() * 100, 0)))
 
     def value_changed(self) -> None:
         """Обновляет системную громкость и отображает значение."""
-        self.volume_object.SetMasterVolumeLevelScalar(self.slider.value() / 100, None)
+        if self.volume_object is not None:
+            self.volume_object.SetMasterVolumeLevelScalar(self.slider.value() / 100, None)
         self.vol.setText(f'{self.slider.value()}%')
 
 
@@ -430,7 +1805,7 @@ class Progress(QDockWidget):
 
         self.progress_bar: QSlider = QSlider(Qt.Orientation.Horizontal, self)
         self.progress_bar.setRange(0, 0)
-        self.progress_bar.actionTriggered.connect(lambda: self.parent.player.setPosition(self.progress_bar.value()))
+        self.progress_bar.actionTriggered.connect(lambda: self.parent.seek(self.progress_bar.value()))
         self.parent.player.positionChanged.connect(self.song_position)
         self.parent.player.durationChanged.connect(self.song_duration)
         self.parent.player.sourceChanged.connect(lambda: self.setWindowTitle(self.parent.player.source().fileName()))
@@ -482,7 +1857,8 @@ class Progress(QDockWidget):
 class ScheduleList(QListWidgetItem):
     """Элемент списка расписания."""
 
-    def __init__(self, name: str, lst: List[str], duration: int, days: str, parent: Optional[QWidget] = None) -> None:
+    def __init__(self, name: str, lst: List[str], duration: int, days: str, parent: Optional[QWidget] = None,
+                 zone: str = '') -> None:
         super().__init__(parent)
         self.setFlags(self.flags() | Qt.ItemFlag.ItemIsUserCheckable)
         self.setCheckState(Qt.CheckState.Unchecked)
@@ -491,26 +1867,113 @@ class ScheduleList(QListWidgetItem):
         self.list: List[str] = lst
         self.duration: int = duration
         self.days: str = days
+        self.zone: str = zone
+
+        self.seconds: array = array('i')
+        self.mask: int = 0
+        self.compile()
+
+    def compile(self) -> None:
+        """Пересобирает отсортированный массив секунд и маску дней по list и days."""
+        self.seconds, self.mask = compile_schedule(self.list, self.days)
+
+    def is_enabled(self) -> bool:
+        """Возвращает True, если расписание включено."""
+        return self.checkState() == Qt.CheckState.Checked
+
+
+class TimesModel(QAbstractListModel):
+    """Модель списка времён расписания поверх самого списка ScheduleList.list; строки держатся по возрастанию."""
+    edited: pyqtSignal = pyqtSignal()
+
+    def __init__(self, times: List[str], parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.times: List[str] = times
+        self.times.sort()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.times)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if index.isValid() and role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.times[index.row()]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        return super().flags(index) | Qt.ItemFlag.ItemIsEditable if index.isValid() else super().flags(index)
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole or self.times[index.row()] == value:
+            return False
+        row: int = index.row()
+        del self.times[row]
+        target: int = bisect_left(self.times, value)
+        self.times.insert(row, value)
+        self.dataChanged.emit(index, index)
+        if target != row:
+            # Переставляем одну строку на её место по времени, не пересобирая список
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), target if target < row else target + 1)
+            self.times.insert(target, self.times.pop(row))
+            self.endMoveRows()
+        self.edited.emit()
+        return True
+
+    def insert(self, value: str) -> int:
+        """Добавляет время на его место по порядку и возвращает номер строки."""
+        row: int = bisect_right(self.times, value)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.times.insert(row, value)
+        self.endInsertRows()
+        self.edited.emit()
+        return row
+
+    def remove(self, row: int) -> None:
+        """Удаляет время из списка."""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.times[row]
+        self.endRemoveRows()
+        self.edited.emit()
+
+
+class TimeDelegate(QStyledItemDelegate):
+    """Редактор времени, создаваемый только для редактируемой строки."""
+
+    def createEditor(self, parent: QWidget, option: Any, index: QModelIndex) -> QWidget:
+        editor: QTimeEdit = QTimeEdit(parent)
+        editor.setDisplayFormat('hh:mm:ss')
+        return editor
+
+    def setEditorData(self, editor: QWidget, index: QModelIndex) -> None:
+        editor.setTime(QTime.fromString(index.data(Qt.ItemDataRole.EditRole), 'hh:mm:ss'))
+
+    def setModelData(self, editor: QWidget, model: Any, index: QModelIndex) -> None:
+        model.setData(index, editor.time().toString('hh:mm:ss'), Qt.ItemDataRole.EditRole)
 
 
 class ScheduleSettings(QDialog):
     """Диалог настроек расписания."""
 
-    def __init__(self, item_data: ScheduleList, parent: Optional[QWidget] = None) -> None:
+    def __init__(self, item_data: ScheduleList, parent: Optional[Schedule] = None) -> None:
         super().__init__(parent)
         self.setWindowTitle(item_data.text())
+        self.parent: Optional[Schedule] = parent
         self.item_data: ScheduleList = item_data
 
         lay: QVBoxLayout = QVBoxLayout(self)
         self.setLayout(lay)
 
         self.name: QLineEdit = QLineEdit(item_data.text(), self)
-        self.name.textChanged.connect(self.change_text)
+        self.name.editingFinished.connect(self.change_text)
         lay.addWidget(self.name)
 
-        self.table: QListWidget = QListWidget(self)
-        self.table.setMovement(QListWidget.Movement.Snap)
-        self.table.setDragDropMode(QListWidget.DragDropMode.InternalMove)
+        self.model: TimesModel = TimesModel(item_data.list, self)
+        self.model.edited.connect(self.save_list)
+        self.table: QListView = QListView(self)
+        self.table.setModel(self.model)
+        self.table.setUniformItemSizes(True)
+        self.table.setItemDelegate(TimeDelegate(self.table))
+        self.table.setEditTriggers(QListView.EditTrigger.DoubleClicked | QListView.EditTrigger.SelectedClicked
+                                   | QListView.EditTrigger.EditKeyPressed)
         self.table.contextMenuEvent = self.right_clicked
         lay.addWidget(self.table)
 
@@ -527,94 +1990,168 @@ class ScheduleSettings(QDialog):
         self.days.clicked.connect(self.change_days)
         lay.addWidget(self.days)
 
-        self.save_timer: QTimer = QTimer(self)
-        self.save_timer.setInterval(3000)
-        self.save_timer.timeout.connect(self.save_list)
-
-        self.load_list()
-
-    def load_list(self) -> None:
-        """Загружает список времен в таблицу."""
-        self.table.clear()
-        for x in self.item_data.list:
-            g: QListWidgetItem = QListWidgetItem(self.table)
-            tm: QTimeEdit = QTimeEdit(self.table)
-            tm.setDisplayFormat('hh:mm:ss')
-            tm.wheelEvent = lambda e: e.ignore()
-            tm.setTime(QTime.fromString(x))
-            tm.timeChanged.connect(self.save_timer.start)
-            tm.contextMenuEvent = self.right_clicked
-            self.table.addItem(g)
-            self.table.setItemWidget(g, tm)
+        self.zone: ZoneComboBox = ZoneComboBox(item_data.zone, self)
+        self.zone.currentIndexChanged.connect(self.change_zone)
+        lay.addWidget(self.zone)
 
     def right_clicked(self, event: Any) -> None:
         """Обработчик правого клика для контекстного меню таблицы."""
-        x: Optional[QListWidgetItem] = self.table.itemAt(event.pos())
+        x: QModelIndex = self.table.indexAt(event.pos())
         menu: QMenu = QMenu(self.table)
         add: QAction = QAction('Добавить', self.table)
         add.triggered.connect(self.add)
         menu.addAction(add)
-        if x:
+        if x.isValid():
             delete: QAction = QAction('Удалить', self.table)
-            delete.triggered.connect(self.delete)
+            delete.triggered.connect(lambda: self.delete(x.row()))
             menu.addAction(delete)
         menu.popup(self.cursor().pos())
         event.accept()
 
     def add(self) -> None:
-        """Добавляет новый элемент времени в расписание."""
-        g: QListWidgetItem = QListWidgetItem(self.table)
-        tm: QTimeEdit = QTimeEdit(self.table)
-        tm.setDisplayFormat('hh:mm:ss')
-        tm.timeChanged.connect(self.save_timer.start)
-        tm.contextMenuEvent = self.right_clicked
-        self.table.addItem(g)
-        self.table.setItemWidget(g, tm)
-        config['schedules'][self.item_data.text()]['list'].append('00:00:00')
-        self.save_list()
+        """Добавляет новый элемент времени в расписание и открывает его редактор."""
+        index: QModelIndex = self.model.index(self.model.insert('00:00:00'))
+        self.table.setCurrentIndex(index)
+        self.table.edit(index)
         logging.info('Add new item to list ' + self.item_data.text())
 
-    def delete(self) -> None:
+    def delete(self, row: int) -> None:
         """Удаляет элемент из расписания."""
-        self.table.takeItem(self.table.currentRow())
-        self.save_list()
+        self.model.remove(row)
         logging.info('Removed item from list ' + self.item_data.text())
 
     def change_text(self) -> None:
-        """Обновляет имя расписания в конфигурации."""
-        config['schedules'][self.name.text()] = config['schedules'][self.item_data.text()].copy()
-        del config['schedules'][self.item_data.text()]
-        self.item_data.setText(self.name.text())
-        save_config()
+        """Переименовывает расписание по окончании ввода; пустое или занятое имя не принимается."""
+        old: str = self.item_data.text()
+        new: str = self.name.text().strip()
+        if new == old:
+            return
+        if not new or new in config['schedules']:
+            QMessageBox.warning(self, 'Переименование', f'Расписание с именем "{new}" уже есть'
+                                if new else 'Имя расписания не может быть пустым')
+            self.name.setText(old)
+            return
+        storage.schedule_renamed(old, new)
+        config['schedules'] = {new if k == old else k: v for k, v in config['schedules'].items()}
+        rename_calendar_rules(old, new)
+        self.item_data.setText(new)
+        self.setWindowTitle(new)
+        self.parent.parent.timeline.calendar_changed()
 
     def change_duration(self) -> None:
         """Обновляет длительность расписания."""
         self.item_data.duration = self.duration.value()
         config['schedules'][self.item_data.text()]['duration'] = self.duration.value()
-        save_config()
+        storage.schedule_changed(self.item_data.text())
+
+    def change_zone(self) -> None:
+        """Переносит расписание в выбранную зону."""
+        self.item_data.zone = self.zone.zone()
+        config['schedules'][self.item_data.text()]['zone'] = self.item_data.zone
+        storage.schedule_changed(self.item_data.text())
 
     def change_days(self, days: str) -> None:
         """Обновляет выбранные дни для расписания."""
         self.item_data.days = days
+        self.item_data.compile()
         config['schedules'][self.item_data.text()]['days'] = days
-        save_config()
+        storage.schedule_changed(self.item_data.text())
+        self.parent.parent.timeline.schedule_changed(self.item_data)
 
     def save_list(self) -> None:
-        """Сохраняет список времен расписания."""
-        self.save_timer.stop()
-        self.item_data.list.clear()
-        for i in self.table.findChildren(QTimeEdit):
-            if i.isVisible():
-                self.item_data.list.append(i.time().toString('hh:mm:ss'))
-        self.item_data.list.sort()
+        """Сохраняет список времен расписания после каждой правки."""
+        self.item_data.compile()
         config['schedules'][self.item_data.text()]['list'] = self.item_data.list
-        save_config()
-        logging.warning('Saved list ' + self.item_data.text())
-        self.load_list()
+        storage.schedule_changed(self.item_data.text())
+        self.parent.parent.timeline.schedule_changed(self.item_data)
+        logging.info('Saved list ' + self.item_data.text())
+
+
+class BellCutoff(QObject):
+    """Ограничивает длительность звонка по расписанию.
+
+    Конец звонка и начало затухания взводятся один раз при старте воспроизведения. Пауза, остановка
+    или ошибка плеера снимают контроль. По окончании плеер останавливается и отправляется сигнал finished,
+    после снятия контроля - released, чтобы владелец вернул трек и громкость.
+    """
+    finished: pyqtSignal = pyqtSignal()
+    released: pyqtSignal = pyqtSignal()
+
+    def __init__(self, player: QMediaPlayer, audio: QAudioOutput, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.player: QMediaPlayer = player
+        self.audio: QAudioOutput = audio
+        self.name: Optional[str] = None
+        self.duration: int = 0
+
+        self.timer: QTimer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.finish)
+        self.fade_timer: QTimer = QTimer(self)
+        self.fade_timer.setSingleShot(True)
+        self.fade_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.fade_timer.timeout.connect(self.fade)
+        self.fade_anim: QPropertyAnimation = QPropertyAnimation(audio, b'volume', self)
+        self.fade_anim.setEndValue(0.0)
+
+        self.player.playingChanged.connect(self.playing_changed)
+        self.player.errorOccurred.connect(lambda: self.cancel('player error'))
+
+    def start(self, name: str, duration: int) -> None:
+        """Запоминает звонок перед вызовом play(); таймеры взводятся, когда звук действительно пойдёт."""
+        self.name = name
+        self.duration = duration
+
+    def playing_changed(self, playing: bool) -> None:
+        """Взводит окончание звонка при старте воспроизведения и отменяет его при паузе или остановке."""
+        if self.name is None:
+            return
+        if playing and not self.timer.isActive():
+            self.arm()
+        elif not playing:
+            self.cancel('playback paused or stopped')
+
+    def arm(self) -> None:
+        """Взводит таймеры начала затухания и окончания звонка от текущей позиции трека."""
+        remaining: int = self.duration * 1000 - self.player.position()
+        if remaining <= 0:
+            self.finish()
+            return
+        self.timer.start(remaining)
+        if fade := min(config['bell_fade'] * 1000, remaining):
+            self.fade_anim.setDuration(fade)
+            self.fade_timer.start(remaining - fade)
+
+    def fade(self) -> None:
+        """Плавно уменьшает громкость до нуля к концу звонка."""
+        self.fade_anim.setStartValue(self.audio.volume())
+        self.fade_anim.start()
+
+    def disarm(self) -> None:
+        """Останавливает таймеры звонка."""
+        self.name = None
+        self.timer.stop()
+        self.fade_timer.stop()
+        self.fade_anim.stop()
+        self.released.emit()
+
+    def finish(self) -> None:
+        """Завершает звонок по истечении длительности расписания."""
+        try:
+            logging.info(f'Stop song, schedule {self.name}')
+            self.name = None
+            self.player.stop()
+            self.finished.emit()
+            self.disarm()
+        except Exception as e:
+            logging.critical('Critical error - ' + str(e))
 
-    def closeEvent(self, event: Any) -> None:
-        """Сохраняет список при закрытии диалога."""
-        self.save_list()
+    def cancel(self, reason: str) -> None:
+        """Снимает контроль длительности звонка, если воспроизведением распорядились вручную."""
+        if self.name is not None:
+            logging.info(f'Bell cut-off cancelled ({reason}), schedule {self.name}')
+            self.disarm()
 
 
 class Schedule(QDockWidget):
@@ -636,12 +2173,11 @@ class Schedule(QDockWidget):
         self.setAllowedAreas(Qt.DockWidgetArea.TopDockWidgetArea)
         self.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable)
 
-        self.timer: QTimer = QTimer(self)
-        self.timer.timeout.connect(self.run)
-        self.timer.setInterval(200)
-        self.timer.start()
+        self.table.itemChanged.connect(self.parent.timeline.schedule_changed)
 
-        self.current: Optional[ScheduleList] = None
+        self.cutoff: BellCutoff = BellCutoff(self.parent.player, self.parent.audio, self)
+        self.cutoff.finished.connect(self.parent.next_song)
+        self.cutoff.released.connect(self.parent.apply_volume)
 
     def add_schedule(self, item: ScheduleList) -> None:
         """Добавляет расписание в таблицу."""
@@ -678,50 +2214,181 @@ class Schedule(QDockWidget):
         if nm:
             item: ScheduleList = ScheduleList(nm, [], 20, '123456', self.table)
             self.table.addItem(item)
-            config['schedules'][nm] = {"enabled": False, "duration": 20, "list": [], "days": "123456"}
+            config['schedules'][nm] = {"enabled": False, "duration": 20, "list": [], "days": "123456", "zone": ""}
+            storage.schedule_changed(nm)
+            self.parent.timeline.schedule_changed(item)
 
     def import_text(self) -> None:
-        """Импортирует расписание из текста."""
+        """Импортирует расписания из текста или файла."""
         it: ImportText = ImportText(self.parent)
-        it.exec()
-        if (out := it.output())[0]:
-            item: ScheduleList = ScheduleList(out[0], out[1], 20, '123456', self.table)
+        if it.exec() != QDialog.DialogCode.Accepted or (out := it.output()) is None:
+            return
+        names: List[str] = []
+        for name, times, days in out.schedules():
+            unique: str = name
+            while unique in config['schedules']:
+                unique += ' - Копия'
+            item: ScheduleList = ScheduleList(unique, times, 20, days, self.table)
             self.table.addItem(item)
-            config['schedules'][out[0]] = {"enabled": False, "duration": 20, "list": out[1], "days": "123456"}
+            config['schedules'][unique] = {"enabled": False, "duration": 20, "list": times, "days": days, "zone": ""}
+            names.append(unique)
+            self.parent.timeline.schedule_changed(item)
+        timed: TimedPlaylist = self.parent.timed_playlist
+        for entry in out.timed:
+            x: TimedPlaylistItem = TimedPlaylistItem(entry['file'], entry['time'], entry['days'], timed.table)
+            timed.table.addItem(x)
+            config['timed_playlist'].append(entry)
+            self.parent.timeline.timed_changed(x)
+        storage.imported(names, out.timed)
+        logging.info(f'Imported schedules {names} and {len(out.timed)} timed items')
 
     def copy(self, item: ScheduleList) -> None:
         """Копирует существующее расписание."""
-        s: ScheduleList = ScheduleList(item.text() + ' - Копия', item.list, item.duration, item.days, self.table)
+        s: ScheduleList = ScheduleList(item.text() + ' - Копия', list(item.list), item.duration, item.days, self.table,
+                                       zone=item.zone)
         self.table.addItem(s)
         config['schedules'][s.text()] = {
-            "enabled": s.checkState() == Qt.CheckState.Checked, "duration": s.duration, "list": s.list, "days": s.days}
-        save_config()
+            "enabled": s.checkState() == Qt.CheckState.Checked, "duration": s.duration, "list": s.list, "days": s.days,
+            "zone": s.zone}
+        storage.schedule_changed(s.text())
+        self.parent.timeline.schedule_changed(s)
 
     def delete(self, item: ScheduleList) -> None:
         """Удаляет расписание."""
         self.table.takeItem(self.table.row(item))
         del config['schedules'][item.text()]
-        save_config()
-
-    def run(self) -> None:
-        """Запускает проверку расписания для воспроизведения треков."""
+        storage.schedule_removed(item.text())
+        rename_calendar_rules(item.text(), None)
+        self.parent.timeline.schedule_changed(item)
+        self.parent.timeline.calendar_changed()
+
+    def items(self) -> List[ScheduleList]:
+        """Возвращает все расписания из таблицы."""
+        return [self.table.item(i) for i in range(self.table.count())]
+
+    def prearm(self) -> None:
+        """Проверяет, что трек для звонка загружен, иначе заранее переключается на следующий."""
+        from PyQt6.QtMultimedia import QMediaPlayer
+        status: QMediaPlayer.MediaStatus = self.parent.player.mediaStatus()
+        if status in (QMediaPlayer.MediaStatus.NoMedia, QMediaPlayer.MediaStatus.InvalidMedia):
+            self.parent.next_song()
+            logging.info('Prearmed next song for schedule bell')
+
+    def fire(self, items: List[tuple[QDateTime, ScheduleList]]) -> None:
+        """Запускает звонок по первому из наступивших расписаний."""
         try:
-            if self.parent.player.isPlaying():
-                if self.parent.player.position() // 1000 == self.current.duration:
-                    self.parent.next_song()
-                    logging.info('Stop song, schedule ' + self.current.text())
-                    self.current = None
-            elif self.timer.isActive():
-                for x in (self.table.item(i) for i in range(self.table.count())):
-                    if x.checkState() == Qt.CheckState.Checked and str(QDate.currentDate().dayOfWeek()) in x.days:
-                        if QTime.currentTime().toString() in x.list and not self.parent.player.isPlaying():
-                            self.parent.player.play()
-                            self.current = x
-                            logging.info('Playing song, schedule ' + x.text())
+            for scheduled, x in items:
+                if not self.parent.player.isPlaying():
+                    self.parent.bell_stats.fired(x.text(), scheduled)
+                    self.cutoff.start(x.text(), x.duration)
+                    self.parent.player.play()
+                    logging.info('Playing song, schedule ' + x.text())
+                    break
         except Exception as e:
             logging.critical('Critical error - ' + str(e))
 
 
+class CalendarDialog(QDialog):
+    """Диалог учебного календаря: каникулы и праздники, особые дни."""
+    WEEKDAYS: tuple[str, ...] = ('понедельник', 'вторник', 'среда', 'четверг', 'пятница', 'суббота', 'воскресенье')
+
+    def __init__(self, parent: Optional[MainWindow] = None) -> None:
+        super().__init__(parent)
+        self.parent: Optional[MainWindow] = parent
+        self.setWindowTitle('Учебный календарь')
+        self.setMinimumWidth(420)
+
+        layout: QGridLayout = QGridLayout(self)
+        self.setLayout(layout)
+
+        layout.addWidget(QLabel('Каникулы и праздники (звонков нет):', self), 0, 0, 1, 4)
+        self.vacations: QListWidget = QListWidget(self)
+        layout.addWidget(self.vacations, 1, 0, 1, 4)
+        self.start: QDateEdit = QDateEdit(QDate.currentDate(), self)
+        layout.addWidget(self.start, 2, 0)
+        self.end: QDateEdit = QDateEdit(QDate.currentDate(), self)
+        layout.addWidget(self.end, 2, 1)
+        self.title: QLineEdit = QLineEdit(self)
+        self.title.setPlaceholderText('Название')
+        layout.addWidget(self.title, 2, 2)
+        add_vacation: QPushButton = QPushButton('Добавить', self)
+        add_vacation.clicked.connect(self.add_vacation)
+        layout.addWidget(add_vacation, 2, 3)
+
+        layout.addWidget(QLabel('Особые дни:', self), 3, 0, 1, 4)
+        self.exceptions: QListWidget = QListWidget(self)
+        layout.addWidget(self.exceptions, 4, 0, 1, 4)
+        self.day: QDateEdit = QDateEdit(QDate.currentDate(), self)
+        layout.addWidget(self.day, 5, 0)
+        self.rule: QComboBox = QComboBox(self)
+        self.rule.addItem('Выходной', 'off')
+        for i, name in enumerate(self.WEEKDAYS, 1):
+            self.rule.addItem('Как ' + name, str(i))
+        for name in config['schedules']:
+            self.rule.addItem('Расписание: ' + name, name)
+        layout.addWidget(self.rule, 5, 1, 1, 2)
+        add_exception: QPushButton = QPushButton('Добавить', self)
+        add_exception.clicked.connect(self.add_exception)
+        layout.addWidget(add_exception, 5, 3)
+
+        remove_vacation: QPushButton = QPushButton('Удалить каникулы', self)
+        remove_vacation.clicked.connect(self.remove_vacation)
+        layout.addWidget(remove_vacation, 6, 0, 1, 2)
+        remove_exception: QPushButton = QPushButton('Удалить особый день', self)
+        remove_exception.clicked.connect(self.remove_exception)
+        layout.addWidget(remove_exception, 6, 2, 1, 2)
+        self.load()
+
+    def describe(self, rule: str) -> str:
+        """Возвращает описание правила особого дня."""
+        if rule == 'off':
+            return 'выходной'
+        if rule in ('1', '2', '3', '4', '5', '6', '7'):
+            return 'как ' + self.WEEKDAYS[int(rule) - 1]
+        return 'расписание ' + rule
+
+    def load(self) -> None:
+        """Заполняет списки из конфигурации."""
+        self.vacations.clear()
+        for start, end, title in config['calendar']['vacations']:
+            self.vacations.addItem(f'{start} - {end} {title}')
+        self.exceptions.clear()
+        for day, rule in config['calendar']['exceptions'].items():
+            item: QListWidgetItem = QListWidgetItem(f'{day}: {self.describe(rule)}')
+            item.setData(Qt.ItemDataRole.UserRole, day)
+            self.exceptions.addItem(item)
+
+    def save(self) -> None:
+        """Сохраняет календарь и перепланирует звонки."""
+        storage.set_value('calendar')
+        self.parent.timeline.calendar_changed()
+        self.load()
+
+    def add_vacation(self) -> None:
+        """Добавляет диапазон дат без звонков."""
+        start, end = sorted((self.start.date(), self.end.date()))
+        config['calendar']['vacations'].append(
+            [start.toString('dd.MM.yyyy'), end.toString('dd.MM.yyyy'), self.title.text().strip()])
+        self.save()
+
+    def add_exception(self) -> None:
+        """Добавляет или заменяет правило особого дня."""
+        config['calendar']['exceptions'][self.day.date().toString('dd.MM.yyyy')] = self.rule.currentData()
+        self.save()
+
+    def remove_vacation(self) -> None:
+        """Удаляет выбранные каникулы."""
+        if self.vacations.currentRow() >= 0:
+            del config['calendar']['vacations'][self.vacations.currentRow()]
+            self.save()
+
+    def remove_exception(self) -> None:
+        """Удаляет выбранный особый день."""
+        if (item := self.exceptions.currentItem()) is not None:
+            del config['calendar']['exceptions'][item.data(Qt.ItemDataRole.UserRole)]
+            self.save()
+
+
 class TimedImportDialog(QDialog):
     """Диалог для импорта файла с указанием даты и времени воспроизведения."""
 
@@ -766,9 +2433,13 @@ class TimedImportDialog(QDialog):
         self.days.setEnabled(False)
         layout.addWidget(self.days, 4, 1, 1, 3)
 
+        layout.addWidget(QLabel('Зона:', self), 5, 0, 1, 1)
+        self.zone: ZoneComboBox = ZoneComboBox('', self)
+        layout.addWidget(self.zone, 5, 1, 1, 3)
+
         import_btn: QPushButton = QPushButton('Добавить', self)
         import_btn.clicked.connect(self.accept)
-        layout.addWidget(import_btn, 5, 0, 1, 4)
+        layout.addWidget(import_btn, 6, 0, 1, 4)
 
     def set_mode(self, mode: str) -> None:
         if mode == 'Один раз':
@@ -784,15 +2455,16 @@ class TimedImportDialog(QDialog):
         if file_path:
             self.file_line.setText(file_path)
 
-    def get_data(self) -> Optional[tuple[str, int], tuple[str, str, str]]:
-        """Возвращает путь к файлу и Unix timestamp, если все поля заполнены."""
+    def get_data(self) -> Optional[tuple[str, str, str, str]]:
+        """Возвращает путь к файлу, время, дату или дни и зону, если все поля заполнены."""
         file_path: str = self.file_line.text().strip()
         if not file_path:
             QMessageBox.warning(self, 'Ошибка', 'Укажите путь к файлу.')
             return None
         if self.date_edit.isEnabled():
-            return file_path, self.time_edit.time().toString(), self.date_edit.date().toString('dd.MM.yyyy')
-        return file_path, self.time_edit.time().toString(), 'd' + self.days.get_days()
+            return (file_path, self.time_edit.time().toString(), self.date_edit.date().toString('dd.MM.yyyy'),
+                    self.zone.zone())
+        return file_path, self.time_edit.time().toString(), 'd' + self.days.get_days(), self.zone.zone()
 
 
 class TimedSettings(QDialog):
@@ -850,9 +2522,13 @@ class TimedSettings(QDialog):
         self.days_widget.setEnabled(self.item.days.startswith('d'))
         layout.addWidget(self.days_widget, 4, 1, 1, 3)
 
+        layout.addWidget(QLabel('Зона:', self), 5, 0)
+        self.zone: ZoneComboBox = ZoneComboBox(self.item.zone, self)
+        layout.addWidget(self.zone, 5, 1, 1, 3)
+
         self.save_btn: QPushButton = QPushButton('Сохранить', self)
         self.save_btn.clicked.connect(self.accept)
-        layout.addWidget(self.save_btn, 5, 0, 1, 4)
+        layout.addWidget(self.save_btn, 6, 0, 1, 4)
 
     def toggle_mode(self, mode: str) -> None:
         """Переключает видимость/доступность даты и дней."""
@@ -865,33 +2541,42 @@ class TimedSettings(QDialog):
 
     def accept(self) -> None:
         """Сохраняет изменения в элементе перед закрытием."""
+        old: Dict[str, str] = self.item.entry()
         if self.mode_combo.currentText() == 'Один раз':
             self.item.days = self.date_edit.date().toString('dd.MM.yyyy')
         else:
             self.item.days = 'd' + self.days_widget.get_days()
         self.item.time = self.time_edit.time().toString()
+        self.item.zone = self.zone.zone()
         self.item.setText(
             f"{basename(self.item.file_path)} - повтор в {self.item.time}"
             if self.item.days.startswith('d')
             else f"{basename(self.item.file_path)} - {self.item.days} {self.item.time}"
         )
-        self.parent.save_items()
+        self.parent.update_item(old, self.item)
+        self.parent.parent.timeline.timed_changed(self.item)
         super().accept()
 
 
 class TimedPlaylistItem(QListWidgetItem):
     """Элемент списка timed плейлиста с файлом и временем."""
 
-    def __init__(self, file_path: str, time: str, days: str, parent: Optional[QWidget] = None) -> None:
+    def __init__(self, file_path: str, time: str, days: str, parent: Optional[QWidget] = None,
+                 zone: str = '') -> None:
         super().__init__(parent)
         self.file_path: str = file_path
         self.time: str = time
         self.days: str = days
+        self.zone: str = zone
         if self.days.startswith('d'):
             self.setText(f"{basename(file_path)} - повтор в {time}")
         else:
             self.setText(f"{basename(file_path)} - {days} {time}")
 
+    def entry(self) -> Dict[str, str]:
+        """Возвращает запись элемента для конфигурации."""
+        return {'file': self.file_path, 'time': self.time, 'days': self.days, 'zone': self.zone}
+
 
 class TimedPlaylist(QDockWidget):
     """Виджет для плейлиста с заданным временем воспроизведения."""
@@ -911,32 +2596,37 @@ class TimedPlaylist(QDockWidget):
         self.setAllowedAreas(Qt.DockWidgetArea.TopDockWidgetArea)
         self.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable)
 
-        self.timer: QTimer = QTimer(self)
-        self.timer.timeout.connect(self.check_and_play)
-        self.timer.setInterval(1000)  # Проверка каждую секунду
-        self.timer.start()
+        self.prearmed: Optional[TimedPlaylistItem] = None
 
     def load_items(self) -> None:
         """Загружает элементы из конфигурации."""
         self.table.clear()
-        for entry in config.get('timed_playlist', []):
+        self.add_entries(config.get('timed_playlist', []))
+        self.parent.timeline.invalidate_timed()
+
+    def add_entries(self, entries: List[Dict[str, str]]) -> None:
+        """Добавляет в список элементы по записям конфигурации."""
+        for entry in entries:
             item: TimedPlaylistItem = TimedPlaylistItem(
-                entry['file'], entry['time'], entry['days'], self.table
+                entry['file'], entry['time'], entry['days'], self.table, zone=entry['zone']
             )
             self.table.addItem(item)
 
-    def save_items(self) -> None:
-        """Сохраняет элементы в конфигурацию."""
-        timed_list: List[Dict[str, Union[str, int]]] = []
-        for i in range(self.table.count()):
-            item: TimedPlaylistItem = self.table.item(i)
-            timed_list.append({
-                'file': item.file_path,
-                'time': item.time,
-                'days': item.days,
-            })
-        config['timed_playlist'] = timed_list
-        save_config()
+    def items(self) -> List[TimedPlaylistItem]:
+        """Возвращает все элементы из таблицы."""
+        return [self.table.item(i) for i in range(self.table.count())]
+
+    def forget(self, items: List[TimedPlaylistItem]) -> None:
+        """Удаляет записи элементов из конфигурации и хранилища."""
+        entries: List[Dict[str, str]] = [x.entry() for x in items]
+        for entry in entries:
+            config['timed_playlist'].remove(entry)
+        storage.timed_removed(entries)
+
+    def update_item(self, old: Dict[str, str], item: TimedPlaylistItem) -> None:
+        """Обновляет запись изменённого элемента в конфигурации и хранилище."""
+        config['timed_playlist'][config['timed_playlist'].index(old)] = item.entry()
+        storage.timed_updated(old, item.entry())
 
     def right_clicked(self, event: Any) -> None:
         """Обработчик правого клика для контекстного меню."""
@@ -959,41 +2649,1187 @@ class TimedPlaylist(QDockWidget):
     def add(self) -> None:
         """Добавляет новый элемент через диалог импорта."""
         dialog: TimedImportDialog = TimedImportDialog(self)
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            file_path, time, days = dialog.get_data()
-            item: TimedPlaylistItem = TimedPlaylistItem(file_path, time, days, self.table)
+        if dialog.exec() == QDialog.DialogCode.Accepted and (data := dialog.get_data()) is not None:
+            file_path, time, days, zone = data
+            item: TimedPlaylistItem = TimedPlaylistItem(file_path, time, days, self.table, zone=zone)
             self.table.addItem(item)
-            self.save_items()
+            config['timed_playlist'].append(item.entry())
+            storage.timed_added(item.entry())
+            self.parent.timeline.timed_changed(item)
             logging.info(f'Added timed item: {file_path} at time {time} at days {days}')
 
     def delete_item(self, item: TimedPlaylistItem) -> None:
         """Удаляет элемент из списка."""
         row: int = self.table.row(item)
         self.table.takeItem(row)
-        self.save_items()
+        self.forget([item])
+        self.parent.timeline.timed_removed(item)
         logging.info(f'Deleted timed item: {item.file_path}')
 
-    def check_and_play(self) -> None:
-        """Проверяет текущее время для автоматического воспроизведения."""
-        time: str = QTime.currentTime().toString()
-        day: str = QDate.currentDate().toString('dd.MM.yyyy')
-        week_day: str = str(QDate.currentDate().dayOfWeek())
-        for i in range(self.table.count() - 1, -1, -1):
-            item: TimedPlaylistItem = self.table.item(i)
-            if item.time == time and not self.parent.player.isPlaying():
-                if item.days == day or (item.days.startswith('d') and week_day in item.days):
+    def remove_items(self, items: List[TimedPlaylistItem]) -> None:
+        """Удаляет элементы из списка за один проход и сохраняет конфигурацию один раз."""
+        removed: set[int] = {id(x) for x in items}
+        taken: List[TimedPlaylistItem] = [self.table.takeItem(i) for i in range(self.table.count() - 1, -1, -1)]
+        for item in reversed(taken):
+            if id(item) not in removed:
+                self.table.addItem(item)
+        config['timed_playlist'] = [x.entry() for x in self.items()]
+        storage.timed_removed([x.entry() for x in items])
+        logging.info(f'Removed {len(items)} expired timed items')
+
+    def is_prearmed(self, item: TimedPlaylistItem) -> bool:
+        """Проверяет, загружен ли файл элемента в плеер заранее."""
+        return self.prearmed is item and self.parent.player.source() == QUrl.fromLocalFile(item.file_path)
+
+    def prearm(self, items: List[TimedPlaylistItem]) -> None:
+        """Заранее загружает файл ближайшего элемента в свободный плеер."""
+        self.disarm()
+        item: TimedPlaylistItem = items[-1]
+        if not self.parent.player.isPlaying():
+            self.parent.previous_song()
+            self.parent.player.setSource(QUrl.fromLocalFile(item.file_path))
+            self.prearmed = item
+            logging.info(f'Prearmed timed file: {item.file_path}')
+
+    def disarm(self) -> None:
+        """Возвращает плеер к треку плейлиста, если заранее загруженный файл так и не был воспроизведён."""
+        if self.prearmed is not None and not self.parent.player.isPlaying() and self.is_prearmed(self.prearmed):
+            self.parent.next_song()
+        self.prearmed = None
+
+    def fire(self, items: List[tuple[QDateTime, TimedPlaylistItem]]) -> None:
+        """Воспроизводит последний из наступивших элементов, если плеер свободен."""
+        for scheduled, item in reversed(items):
+            if not self.parent.player.isPlaying():
+                if not self.is_prearmed(item):
+                    self.disarm()
                     self.parent.previous_song()
                     self.parent.player.setSource(QUrl.fromLocalFile(item.file_path))
-                    self.parent.player.play()
-                    if not item.days.startswith('d'):
-                        self.table.takeItem(i)
-                        self.save_items()
-                    logging.info(f'Playing timed file: {item.file_path}')
-                    break
+                self.prearmed = None
+                self.parent.bell_stats.fired(basename(item.file_path), scheduled)
+                self.parent.player.play()
+                if not item.days.startswith('d'):
+                    self.table.takeItem(self.table.row(item))
+                    self.forget([item])
+                logging.info(f'Playing timed file: {item.file_path}')
+                break
+
+
+class DayPlan:
+    """Сводный план звонков на день недели: отсортированные секунды и расписания для каждой из них."""
+
+    def __init__(self, seconds: Iterable[int] = (), schedules: Iterable[ScheduleList] = ()) -> None:
+        self.seconds: array = array('i', seconds)
+        self.schedules: List[ScheduleList] = list(schedules)
+
+    def add(self, x: ScheduleList, seconds: Iterable[int], rank: Dict[int, int]) -> None:
+        """Вставляет звонки расписания x; одновременные звонки остаются в порядке расписаний в таблице.
+
+        rank - номер расписания в таблице по id (элементы QListWidgetItem нехешируемы).
+        """
+        for sec in seconds:
+            i: int = bisect_left(self.seconds, sec)
+            j: int = bisect_right(self.seconds, sec, i)
+            while i < j and rank.get(id(self.schedules[i]), -1) < rank[id(x)]:
+                i += 1
+            self.seconds.insert(i, sec)
+            self.schedules.insert(i, x)
+
+    def remove(self, x: ScheduleList, seconds: Iterable[int]) -> None:
+        """Убирает звонки расписания x в указанные секунды."""
+        for sec in seconds:
+            i: int = bisect_left(self.seconds, sec)
+            i = self.schedules.index(x, i, bisect_right(self.seconds, sec, i))
+            del self.seconds[i]
+            del self.schedules[i]
+
+    def next_after(self, second: int) -> Optional[int]:
+        """Возвращает ближайшую секунду звонка строго после second."""
+        i: int = bisect_right(self.seconds, second)
+        return self.seconds[i] if i < len(self.seconds) else None
+
+    def at(self, second: int) -> List[ScheduleList]:
+        """Возвращает расписания со звонком в указанную секунду."""
+        return self.schedules[bisect_left(self.seconds, second):bisect_right(self.seconds, second)]
+
+    def between(self, lo: int, hi: int) -> List[tuple[int, ScheduleList]]:
+        """Возвращает звонки в секунды из интервала (lo, hi] в хронологическом порядке."""
+        i: int = bisect_right(self.seconds, lo)
+        j: int = bisect_right(self.seconds, hi)
+        return list(zip(self.seconds[i:j], self.schedules[i:j]))
+
+
+def compile_day_plans(schedules: Iterable[ScheduleList]) -> List[DayPlan]:
+    """Собирает планы для всех семи дней недели из включённых расписаний.
+
+    Отсортированные массивы секунд расписаний сливаются heapq.merge; слияние устойчиво, поэтому
+    одновременные звонки идут в порядке расписаний. Дни с одинаковым набором расписаний сливаются один раз.
+    """
+    per_day: List[List[ScheduleList]] = [[] for _ in range(7)]
+    for x in schedules:
+        if x.is_enabled() and x.mask:
+            for day in range(7):
+                if x.mask >> day & 1:
+                    per_day[day].append(x)
+    plans: List[DayPlan] = []
+    for day, members in enumerate(per_day):
+        if day and members == per_day[day - 1]:
+            plans.append(DayPlan(plans[-1].seconds, plans[-1].schedules))
+            continue
+        merged: List[tuple[int, ScheduleList]] = list(
+            heapq.merge(*(zip(x.seconds, repeat(x)) for x in members), key=itemgetter(0)))
+        plans.append(DayPlan(map(itemgetter(0), merged), map(itemgetter(1), merged)))
+    return plans
+
+
+def date_jd(text: str) -> int:
+    """Переводит дату dd.MM.yyyy в юлианский день."""
+    dd, mm, yyyy = text.split('.')
+    return Date(int(yyyy), int(mm), int(dd)).toordinal() + 1721425
+
+
+class Calendar:
+    """Учебный календарь: каникулы (диапазоны дат) и особые дни.
+
+    Особый день - выходной ('off'), день недели, по плану которого он проходит ('1'-'7'),
+    или имя расписания, которое звонит в этот день вместо обычных (сокращённый день).
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        ranges: List[tuple[int, int]] = []
+        for start, end, *_ in data['vacations']:
+            try:
+                ranges.append((date_jd(start), date_jd(end)))
+            except ValueError:
+                logging.error(f'Invalid vacation range: {start} - {end}')
+        # Пересекающиеся диапазоны сливаются, чтобы в rule хватало одного бинарного поиска
+        self.vacations: List[tuple[int, int]] = []
+        for start, end in sorted(ranges):
+            if self.vacations and start <= self.vacations[-1][1] + 1:
+                self.vacations[-1] = (self.vacations[-1][0], max(self.vacations[-1][1], end))
+            else:
+                self.vacations.append((start, end))
+        self.exceptions: Dict[int, str] = {}
+        for day, rule in data['exceptions'].items():
+            try:
+                self.exceptions[date_jd(day)] = rule
+            except ValueError:
+                logging.error(f'Invalid calendar exception date: {day}')
+
+    def rule(self, jd: int) -> Optional[str]:
+        """Возвращает правило дня: особый день важнее каникул, None - обычный день."""
+        if jd in self.exceptions:
+            return self.exceptions[jd]
+        i: int = bisect_right(self.vacations, (jd, 1 << 62)) - 1
+        return 'off' if i >= 0 and self.vacations[i][0] <= jd <= self.vacations[i][1] else None
+
+
+def rename_calendar_rules(old: str, new: Optional[str]) -> None:
+    """Переносит особые дни календаря на переименованное расписание, при удалении (new=None) убирает их."""
+    exceptions: Dict[str, str] = config['calendar']['exceptions']
+    days: List[str] = [day for day, rule in exceptions.items() if rule == old]
+    for day in days:
+        if new is None:
+            del exceptions[day]
+        else:
+            exceptions[day] = new
+    if days:
+        storage.set_value('calendar')
+
+
+def compile_date_plan(date: QDate, calendar: Calendar, plans: List[DayPlan],
+                      schedules: Iterable[ScheduleList]) -> DayPlan:
+    """Собирает план звонков на конкретную дату с учётом учебного календаря."""
+    rule: Optional[str] = calendar.rule(date.toJulianDay())
+    if rule is None:
+        return plans[date.dayOfWeek() - 1]
+    if rule == 'off':
+        return DayPlan()
+    if rule in ('1', '2', '3', '4', '5', '6', '7'):
+        return plans[int(rule) - 1]
+    for x in schedules:
+        if x.text() == rule:
+            return DayPlan(x.seconds, repeat(x, len(x.seconds)))
+    logging.error(f'Calendar refers to unknown schedule {rule}')
+    return plans[date.dayOfWeek() - 1]
+
+
+def day_key(date: QDate, second: int) -> int:
+    """Возвращает сквозной номер секунды: юлианский день * 86400 + секунда дня."""
+    return date.toJulianDay() * 86400 + second
+
+
+def timed_key(item: TimedPlaylistItem, after: int) -> Optional[int]:
+    """Возвращает ключ ближайшего срабатывания элемента после after.
+
+    Для разовых элементов возвращается ключ их даты и времени, даже если он уже в прошлом.
+    """
+    sec: int = time_to_seconds(item.time)
+    if item.days.startswith('d'):
+        mask: int = days_to_mask(item.days)
+        jd: int = after // 86400
+        for d in range(8):
+            # Юлианский день 0 приходится на понедельник
+            if mask >> ((jd + d) % 7) & 1 and (key := (jd + d) * 86400 + sec) > after:
+                return key
+        return None
+    return date_jd(item.days) * 86400 + sec
+
+
+class TimedQueue:
+    """Очередь элементов плейлиста по времени в виде кучи по ключу ближайшего срабатывания.
+
+    Записи кучи - списки [ключ, номер, элемент]; у удалённого элемента запись остаётся в куче с элементом None
+    и отбрасывается, когда доходит до вершины.
+    """
+
+    def __init__(self) -> None:
+        self.heap: List[list] = []
+        self.entries: Dict[int, list] = {}  # id элемента -> его запись в куче
+        self.counter: int = 0
+
+    @staticmethod
+    def key(item: TimedPlaylistItem, after: int) -> Optional[int]:
+        """Возвращает ключ срабатывания элемента (timed_key), для ошибочной записи - None."""
+        try:
+            return timed_key(item, after)
+        except ValueError:
+            logging.error(f'Invalid timed item: {item.file_path} at {item.days} {item.time}')
+            return None
+
+    def push(self, item: TimedPlaylistItem, key: int) -> None:
+        """Добавляет элемент с указанным ключом срабатывания."""
+        self.counter += 1
+        entry: list = [key, self.counter, item]
+        self.entries[id(item)] = entry
+        heapq.heappush(self.heap, entry)
+
+    def remove(self, item: TimedPlaylistItem) -> None:
+        """Убирает элемент из очереди, если он в ней есть."""
+        if (entry := self.entries.pop(id(item), None)) is not None:
+            entry[2] = None
+            if len(self.heap) > 2 * len(self.entries) + 16:
+                # Удалённых записей больше, чем живых, - кучу дешевле собрать заново
+                self.heap = [e for e in self.heap if e[2] is not None]
+                heapq.heapify(self.heap)
+            self.prune()
+
+    def prune(self) -> None:
+        """Снимает с вершины кучи записи удалённых элементов."""
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+
+    def rebuild(self, items: Iterable[TimedPlaylistItem], after: int) -> List[TimedPlaylistItem]:
+        """Заново строит очередь и возвращает разовые элементы, время которых уже прошло."""
+        self.heap = []
+        self.entries = {}
+        expired: List[TimedPlaylistItem] = []
+        for item in items:
+            if (key := self.key(item, after)) is None:
+                continue
+            if key <= after:
+                expired.append(item)
+            else:
+                self.counter += 1
+                self.entries[id(item)] = entry = [key, self.counter, item]
+                self.heap.append(entry)
+        heapq.heapify(self.heap)
+        return expired
+
+    def peek(self) -> Optional[int]:
+        """Возвращает ключ ближайшего срабатывания."""
+        return self.heap[0][0] if self.heap else None
+
+    def top(self) -> List[TimedPlaylistItem]:
+        """Возвращает все элементы с ближайшим ключом срабатывания, не извлекая их."""
+        if not self.heap:
+            return []
+        key: int = self.heap[0][0]
+        found: List[list] = []
+        stack: List[int] = [0]
+        while stack:
+            i: int = stack.pop()
+            if i < len(self.heap) and self.heap[i][0] == key:
+                if self.heap[i][2] is not None:
+                    found.append(self.heap[i])
+                stack.extend((2 * i + 1, 2 * i + 2))
+        return [item for _, _, item in sorted(found, key=lambda e: e[1])]
+
+    def pop_until(self, key: int) -> List[tuple[int, TimedPlaylistItem]]:
+        """Извлекает все элементы с ключом не больше key, повторяющиеся возвращает в очередь на следующий раз."""
+        out: List[tuple[int, TimedPlaylistItem]] = []
+        while self.heap and self.heap[0][0] <= key:
+            k, _, item = heapq.heappop(self.heap)
+            if item is not None:
+                del self.entries[id(item)]
+                out.append((k, item))
+        for _, item in out:
+            if item.days.startswith('d') and (nxt := timed_key(item, key)) is not None:
+                self.push(item, nxt)
+        self.prune()
+        return out
+
+
+class BellTimeline(QObject):
+    """Движок звонков: вычисляет ближайший момент срабатывания и взводит один таймер до него.
+
+    Обработанный интервал времени отслеживается по настенным часам, а их скачки и задержки цикла событий -
+    по монотонным. Звонки, пропущенные из-за блокировки интерфейса, воспроизводятся с опозданием
+    в пределах config['bell_grace'] секунд, более старые записываются в журнал как пропущенные.
+    """
+    schedule_due: pyqtSignal = pyqtSignal(list)
+    timed_due: pyqtSignal = pyqtSignal(list)
+    timed_expired: pyqtSignal = pyqtSignal(list)
+    upcoming: pyqtSignal = pyqtSignal(list, list)
+
+    MAX_SLEEP: int = 60000  # Не дольше минуты без проверки часов, чтобы заметить их перевод
+    MERGE_LIMIT: int = 16  # Больше изменённых расписаний за раз (загрузка, импорт) - планы собираются заново
+
+    def __init__(self, schedules: Callable[[], Iterable[ScheduleList]],
+                 timed: Callable[[], Iterable[TimedPlaylistItem]], parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.schedules: Callable[[], Iterable[ScheduleList]] = schedules
+        self.timed: Callable[[], Iterable[TimedPlaylistItem]] = timed
+
+        self.timer: QTimer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.replan)
+
+        # Пачку изменений конфигурации сводим в одно перепланирование
+        self.plan_timer: QTimer = QTimer(self)
+        self.plan_timer.setSingleShot(True)
+        self.plan_timer.setInterval(0)
+        self.plan_timer.timeout.connect(self.replan)
+
+        # Заблаговременная подготовка трека за config['prearm'] секунд до звонка
+        self.prearm_timer: QTimer = QTimer(self)
+        self.prearm_timer.setSingleShot(True)
+        self.prearm_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.prearm_timer.timeout.connect(self.prearm)
+        self.prearmed: Optional[QDateTime] = None
+
+        self.target: Optional[QDateTime] = None
+        self.done_date: QDate = QDate.currentDate()
+        self.done_until: int = -1
+        self.last_wall: int = QDateTime.currentMSecsSinceEpoch()
+        self.last_mono: float = monotonic()
+        self.offset: int = 0  # Поправка к местным часам в мс, задаётся синхронизацией с ведущим узлом
+
+        self.plans: List[DayPlan] = compile_day_plans([])
+        # Секунды и дни, с которыми каждое включённое расписание вошло в планы, - чтобы убрать именно их.
+        # Ключи - id расписаний: элементы QListWidgetItem нехешируемы
+        self.merged: Dict[int, tuple[ScheduleList, array, int]] = {}
+        self.changed: Dict[int, ScheduleList] = {}
+        self.calendar: Calendar = Calendar(DEFAULT_CONFIG['calendar'])
+        # План на конкретную дату собирается один раз в сутки и при изменении расписаний
+        self.day_plan: DayPlan = self.plans[0]
+        self.day_plan_date: Optional[QDate] = None
+        self.dirty: bool = True
+        self.calendar_dirty: bool = True
+        self.queue: TimedQueue = TimedQueue()
+        self.timed_dirty: bool = True
+        self.expired: List[TimedPlaylistItem] = []  # Прошедшие разовые элементы, добавленные после перестроения
+
+    def now(self) -> QDateTime:
+        """Возвращает текущее время с поправкой синхронизации."""
+        return QDateTime.currentDateTime().addMSecs(self.offset)
+
+    def set_offset(self, offset: int) -> None:
+        """Меняет поправку часов и перевзводит таймер, если она заметно изменилась."""
+        if abs(offset - self.offset) >= 2:
+            self.offset = offset
+            self.plan_timer.start()
+
+    def invalidate(self) -> None:
+        """Помечает устаревшим весь план, перепланирование выполнится в следующей итерации цикла событий."""
+        self.dirty = True
+        self.calendar_dirty = True
+        self.timed_dirty = True
+        self.plan_timer.start()
+
+    def schedule_changed(self, x: ScheduleList) -> None:
+        """Помечает изменённым одно расписание (добавленное, удалённое, включённое или с новыми временами).
+
+        При перепланировании в планах дней заменяются только его звонки.
+        """
+        self.changed[id(x)] = x
+        self.plan_timer.start()
+
+    def invalidate_timed(self) -> None:
+        """Помечает устаревшей всю очередь элементов по времени (после загрузки списка)."""
+        self.timed_dirty = True
+        self.plan_timer.start()
+
+    def timed_changed(self, item: TimedPlaylistItem) -> None:
+        """Ставит в очередь добавленный или изменённый элемент по времени вместо его прежнего ключа."""
+        self.queue.remove(item)
+        after: int = day_key(self.done_date, self.done_until)
+        if (key := self.queue.key(item, after)) is not None:
+            if key > after:
+                self.queue.push(item, key)
+            else:
+                self.expired.append(item)
+        self.plan_timer.start()
+
+    def timed_removed(self, item: TimedPlaylistItem) -> None:
+        """Убирает удалённый элемент по времени из очереди."""
+        self.queue.remove(item)
+        self.expired = [x for x in self.expired if x is not item]
+        self.plan_timer.start()
+
+    def calendar_changed(self) -> None:
+        """Помечает устаревшим учебный календарь (правила особых дней ссылаются на имена расписаний)."""
+        self.calendar_dirty = True
+        self.plan_timer.start()
+
+    def merge_changed(self) -> None:
+        """Заменяет в планах дней звонки изменённых расписаний."""
+        rank: Dict[int, int] = {id(x): i for i, x in enumerate(self.schedules())}
+        for key, x in self.changed.items():
+            if (old := self.merged.pop(key, None)) is not None:
+                for day in range(7):
+                    if old[2] >> day & 1:
+                        self.plans[day].remove(x, old[1])
+            if key in rank and x.is_enabled() and x.mask:
+                self.merged[key] = (x, x.seconds, x.mask)
+                for day in range(7):
+                    if x.mask >> day & 1:
+                        self.plans[day].add(x, x.seconds, rank)
+        self.changed.clear()
+        self.day_plan_date = None
+
+    def plan(self, date: QDate) -> DayPlan:
+        """Возвращает план звонков на дату, собирая его при первом обращении за эту дату."""
+        if date != self.day_plan_date:
+            self.day_plan = compile_date_plan(date, self.calendar, self.plans, self.schedules())
+            self.day_plan_date = date
+        return self.day_plan
+
+    def timed_between(self, date: QDate, lo: int, hi: int) -> List[tuple[int, TimedPlaylistItem]]:
+        """Извлекает из очереди элементы, срабатывающие в секунды дня из (lo, hi].
+
+        Более ранние разовые элементы передаются в сигнал timed_expired.
+        """
+        base: int = day_key(date, 0)
+        due: List[tuple[int, TimedPlaylistItem]] = []
+        expired: List[TimedPlaylistItem] = []
+        for key, x in self.queue.pop_until(base + hi):
+            if key > base + lo:
+                due.append((key - base, x))
+            elif not x.days.startswith('d'):
+                expired.append(x)
+        if expired:
+            self.timed_expired.emit(expired)
+        return due
+
+    def next_second(self, date: QDate, after: int) -> Optional[int]:
+        """Возвращает ближайшую секунду дня после after, в которую что-то должно сработать."""
+        best: Optional[int] = self.plan(date).next_after(after)
+        if (key := self.queue.peek()) is not None and (sec := key - day_key(date, 0)) < 86400:
+            if after < sec and (best is None or sec < best):
+                best = sec
+        return best
+
+    def check_clock(self, now: QDateTime) -> None:
+        """Сравнивает ход настенных и монотонных часов и записывает в журнал перевод часов."""
+        wall: int = now.toMSecsSinceEpoch()
+        mono: float = monotonic()
+        drift: int = (wall - self.last_wall) - int((mono - self.last_mono) * 1000)
+        if abs(drift) > 2000:
+            logging.warning(f'System clock jumped by {drift} ms')
+        self.last_wall = wall
+        self.last_mono = mono
+
+    def catch_up(self, date: QDate, second: int) -> None:
+        """Обрабатывает все события в секунды (done_until, second] и передаёт их обработчикам."""
+        grace: int = config['bell_grace']
+        schedules: List[tuple[QDateTime, ScheduleList]] = []
+        timed: List[tuple[QDateTime, TimedPlaylistItem]] = []
+        skipped: List[TimedPlaylistItem] = []
+        for sec, x in self.plan(date).between(self.done_until, second):
+            if second - sec <= grace:
+                schedules.append((QDateTime(date, QTime(0, 0).addSecs(sec)), x))
+            else:
+                logging.warning(f'Skipped bell at {mseconds_to_time(sec * 1000)}, schedule {x.text()}')
+        for sec, x in self.timed_between(date, self.done_until, second):
+            if second - sec <= grace:
+                timed.append((QDateTime(date, QTime(0, 0).addSecs(sec)), x))
+            else:
+                logging.warning(f'Skipped timed file at {x.time}: {x.file_path}')
+                if not x.days.startswith('d'):
+                    skipped.append(x)
+        if self.target is not None and (late := self.target.msecsTo(self.now())) > 1000:
+            logging.warning(f'Bell timer fired {late} ms late')
+        self.done_until = second
+        if schedules:
+            self.schedule_due.emit(schedules)
+        if timed:
+            self.timed_due.emit(timed)
+        if skipped:
+            # Пропущенный разовый элемент больше не сработает - удаляется так же, как прошедший
+            self.timed_expired.emit(skipped)
+
+    def replan(self) -> None:
+        """Обрабатывает наступившие события, вычисляет ближайший момент срабатывания и взводит таймер."""
+        self.plan_timer.stop()
+        self.check_clock(QDateTime.currentDateTime())
+        now: QDateTime = self.now()
+        today: QDate = now.date()
+        second: int = now.time().msecsSinceStartOfDay() // 1000
+        if today != self.done_date:
+            # При переводе часов назад через полночь не повторяем уже прозвеневшие звонки
+            if today < self.done_date:
+                self.done_until = second
+                self.timed_dirty = True
+            else:
+                self.done_until = -1
+            self.done_date = today
+        if self.target is not None and now >= self.target:
+            self.catch_up(today, second)
+        else:
+            # Момент срабатывания ещё не наступил, значит всё до текущей секунды уже обработано
+            self.done_until = max(self.done_until, second - 1)
+        if self.dirty or len(self.changed) > self.MERGE_LIMIT:
+            schedules: List[ScheduleList] = list(self.schedules())
+            self.plans = compile_day_plans(schedules)
+            self.merged = {id(x): (x, x.seconds, x.mask) for x in schedules if x.is_enabled() and x.mask}
+            self.changed.clear()
+            self.day_plan_date = None
+            self.dirty = False
+        elif self.changed:
+            self.merge_changed()
+        if self.calendar_dirty:
+            self.calendar = Calendar(config['calendar'])
+            self.day_plan_date = None
+            self.calendar_dirty = False
+        if self.timed_dirty:
+            self.timed_dirty = False
+            self.expired = self.queue.rebuild(self.timed(), day_key(today, self.done_until))
+        if self.expired:
+            expired, self.expired = self.expired, []
+            self.timed_expired.emit(expired)
+        nxt: Optional[int] = self.next_second(today, self.done_until)
+        if nxt is None:
+            # Событий до конца дня нет - просыпаемся в полночь, чтобы спланировать следующий день
+            self.target = QDateTime(today.addDays(1), QTime(0, 0))
+        else:
+            self.target = QDateTime(today, QTime(0, 0).addSecs(nxt))
+        self.timer.start(min(self.MAX_SLEEP, max(0, now.msecsTo(self.target))))
+        self.prearm_timer.stop()
+        if nxt is not None and config['prearm']:
+            if (lead := now.msecsTo(self.target) - config['prearm'] * 1000) > 0:
+                self.prearm_timer.start(lead)
+            else:
+                self.prearm()
+
+    def prearm(self) -> None:
+        """Сообщает обработчикам о ближайших событиях, чтобы они заранее подготовили воспроизведение."""
+        if self.target is None or self.target == self.prearmed:
+            return
+        self.prearmed = self.target
+        date: QDate = self.target.date()
+        second: int = self.target.time().msecsSinceStartOfDay() // 1000
+        timed: List[TimedPlaylistItem] = self.queue.top() if self.queue.peek() == day_key(date, second) else []
+        schedules: List[ScheduleList] = self.plan(date).at(second)
+        if schedules or timed:
+            self.upcoming.emit(schedules, timed)
+
+
+def sync_payload() -> Dict[str, Any]:
+    """Возвращает расписания и элементы по времени, которые ведущий узел раздаёт ведомым."""
+    return {'schedules': config['schedules'], 'timed_playlist': config['timed_playlist'],
+            'calendar': config['calendar']}
+
+
+def sync_revision(text: str) -> str:
+    """Возвращает короткий отпечаток расписаний в JSON, по которому ведомый узнаёт об их изменении."""
+    return sha1(text.encode()).hexdigest()[:16]
+
+
+def valid_sync_payload(payload: Any) -> bool:
+    """Проверяет, что расписания от ведущего узла имеют ожидаемую структуру и типы."""
+    if not isinstance(payload, dict) or not isinstance(payload.get('schedules'), dict) \
+            or not isinstance(payload.get('timed_playlist'), list) \
+            or not isinstance(payload.get('calendar', {}), dict):
+        return False
+    for x in payload['schedules'].values():
+        if not (isinstance(x, dict) and isinstance(x.get('enabled'), bool) and isinstance(x.get('duration'), int)
+                and isinstance(x.get('days'), str) and isinstance(x.get('zone', ''), str)
+                and isinstance(x.get('list'), list) and all(isinstance(t, str) for t in x['list'])):
+            return False
+    calendar: Dict[str, Any] = payload.get('calendar', DEFAULT_CONFIG['calendar'])
+    if not (isinstance(calendar.get('vacations'), list) and isinstance(calendar.get('exceptions'), dict)
+            and all(isinstance(x, list) and len(x) >= 2 and all(isinstance(v, str) for v in x)
+                    for x in calendar['vacations'])
+            and all(isinstance(v, str) for v in calendar['exceptions'].values())):
+        return False
+    return all(isinstance(x, dict) and all(isinstance(x.get(k), str) for k in ('file', 'time', 'days'))
+               and isinstance(x.get('zone', ''), str) for x in payload['timed_playlist'])
+
+
+def valid_sync_message(message: Any, keys: Dict[str, type]) -> bool:
+    """Проверяет, что сообщение - словарь с ключами keys нужных типов."""
+    return isinstance(message, dict) and all(isinstance(message.get(k), t) for k, t in keys.items())
+
+
+def apply_sync_payload(payload: Dict[str, Any]) -> None:
+    """Заменяет расписания и элементы по времени полученными от ведущего узла и сохраняет их."""
+    config['schedules'] = payload['schedules']
+    config['timed_playlist'] = payload['timed_playlist']
+    config['calendar'] = payload.get('calendar', deepcopy(DEFAULT_CONFIG['calendar']))
+    for entry in [*config['schedules'].values(), *config['timed_playlist']]:
+        entry.setdefault('zone', '')
+    storage.schedules_replaced()
+
+
+class BellSync(QObject):
+    """Синхронизация звонков в локальной сети по UDP.
+
+    Ведущий узел отвечает на запросы времени и выдаёт свои расписания. Ведомый раз в POLL_INTERVAL
+    измеряет смещение часов по четырём отметкам времени, как NTP, и сдвигает по нему BellTimeline,
+    а при смене отпечатка расписаний запрашивает их заново. Из последних замеров берётся замер
+    с наименьшей задержкой в сети - он точнее всего.
+
+    Расписания передаются частями по CHUNK символов JSON, каждая - отдельной датаграммой, не больше WINDOW
+    частей на запрос, чтобы не переполнить приёмный буфер ведомого. Ведомый собирает части, запрашивает
+    следующие и сверяет отпечаток; потерянные части запрашиваются заново на следующем замере.
+    """
+    received: pyqtSignal = pyqtSignal(dict)
+
+    POLL_INTERVAL: int = 10000
+    BURST: int = 4
+    MAX_DATAGRAM: int = 60000
+    CHUNK: int = 12000  # Символ в UTF-8 с экранированием занимает до 4 байт
+    MAX_PARTS: int = 1000
+    WINDOW: int = 4
+
+    def __init__(self, timeline: BellTimeline, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.timeline: BellTimeline = timeline
+        self.role: str = config['sync_role']
+        from PyQt6.QtNetwork import QUdpSocket, QHostAddress
+        self.socket: QUdpSocket = QUdpSocket(self)
+        self.socket.readyRead.connect(self.read)
+        self.samples: deque = deque(maxlen=8)
+        self.revision: str = ''
+        self.burst: int = 0
+        # Ведущий: (Storage.edits, отпечаток, датаграммы частей) - пересчитываются только после изменений
+        self.cache: Optional[tuple[int, str, List[bytes]]] = None
+        # Ведомый: собираемые части расписаний, их отпечаток, общее число и первая запрошенная часть
+        self.parts: Dict[int, str] = {}
+        self.parts_rev: str = ''
+        self.parts_total: int = 0
+        self.requested: int = 0
+
+        self.poll_timer: QTimer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+        if self.role == 'master':
+            if not self.socket.bind(QHostAddress(QHostAddress.SpecialAddress.AnyIPv4), config['sync_port']):
+                logging.error(f'Sync master cannot bind port {config["sync_port"]}: {self.socket.errorString()}')
+            else:
+                logging.info(f'Sync master listening on port {config["sync_port"]}')
+        elif self.role == 'follower':
+            self.socket.bind(QHostAddress(QHostAddress.SpecialAddress.AnyIPv4), 0)
+            self.master: QHostAddress = QHostAddress(config['sync_master'])
+            # Несколько замеров подряд при запуске, затем раз в POLL_INTERVAL
+            self.burst = self.BURST
+            self.poll_timer.start(200)
+
+    def send(self, message: Dict[str, Any], host: QHostAddress, port: int) -> None:
+        """Отправляет сообщение одной датаграммой JSON."""
+        self.write(json.dumps(message, ensure_ascii=False).encode(), host, port)
+
+    def write(self, data: bytes, host: QHostAddress, port: int) -> None:
+        """Отправляет готовую датаграмму."""
+        if len(data) > self.MAX_DATAGRAM:
+            logging.error(f'Sync message too large: {len(data)} bytes')
+            return
+        self.socket.writeDatagram(data, host, port)
+
+    def payload(self) -> tuple[str, List[bytes]]:
+        """Возвращает отпечаток и датаграммы частей расписаний, пересчитывая их после изменения конфигурации."""
+        if self.cache is None or self.cache[0] != Storage.edits:
+            text: str = json.dumps(sync_payload(), sort_keys=True, ensure_ascii=False)
+            rev: str = sync_revision(text)
+            parts: List[str] = [text[i:i + self.CHUNK] for i in range(0, len(text), self.CHUNK)]
+            self.cache = (Storage.edits, rev, [
+                json.dumps({'type': 'config', 'rev': rev, 'part': i, 'parts': len(parts), 'data': part},
+                           ensure_ascii=False).encode() for i, part in enumerate(parts)])
+        return self.cache[1], self.cache[2]
+
+    def poll(self) -> None:
+        """Отправляет ведущему запрос времени."""
+        if self.burst:
+            self.burst -= 1
+            if not self.burst:
+                self.poll_timer.setInterval(self.POLL_INTERVAL)
+        self.send({'type': 'time', 't0': QDateTime.currentMSecsSinceEpoch()}, self.master, config['sync_port'])
+
+    def read(self) -> None:
+        """Разбирает пришедшие датаграммы; время получения фиксируется до разбора."""
+        from PyQt6.QtNetwork import QHostAddress
+        while self.socket.hasPendingDatagrams():
+            received: int = QDateTime.currentMSecsSinceEpoch()
+            datagram: Any = self.socket.receiveDatagram()
+            sender: QHostAddress = datagram.senderAddress()
+            if self.role == 'follower' and not sender.isEqual(
+                    self.master, QHostAddress.ConversionModeFlag.ConvertV4MappedToIPv4):
+                logging.warning(f'Ignored sync datagram from {sender.toString()}: not the sync master')
+                continue
+            try:
+                message: Any = json.loads(bytes(datagram.data()))
+                if not valid_sync_message(message, {'type': str}):
+                    raise ValueError('not a sync message')
+                if self.role == 'master':
+                    self.answer(message, received, sender, datagram.senderPort())
+                else:
+                    self.follow(message, received)
+            except (ValueError, KeyError, TypeError) as e:
+                logging.warning(f'Ignored malformed sync datagram from {sender.toString()}: {e}')
+
+    def follow(self, message: Dict[str, Any], received: int) -> None:
+        """Обрабатывает ответ ведущего узла."""
+        if message['type'] == 'time' and valid_sync_message(message, {'t0': int, 't1': int, 't2': int, 'rev': str}):
+            self.measure(message, received)
+        elif message['type'] == 'config' and valid_sync_message(message, {'rev': str, 'part': int, 'parts': int,
+                                                                          'data': str}) \
+                and 0 <= message['part'] < message['parts'] <= self.MAX_PARTS:
+            self.assemble(message)
+        else:
+            raise ValueError(f'unexpected {message["type"]} message')
+
+    def request_config(self) -> None:
+        """Запрашивает у ведущего очередные части расписаний, начиная с первой недостающей."""
+        self.requested = next((i for i in range(self.parts_total) if i not in self.parts), 0)
+        self.send({'type': 'config', 'part': self.requested}, self.master, config['sync_port'])
+
+    def assemble(self, message: Dict[str, Any]) -> None:
+        """Собирает расписания из частей и применяет их, когда пришли все части."""
+        if message['rev'] != self.parts_rev or message['parts'] != self.parts_total:
+            self.parts = {}
+            self.parts_rev = message['rev']
+            self.parts_total = message['parts']
+        self.parts[message['part']] = message['data']
+        if len(self.parts) < self.parts_total:
+            if message['part'] == min(self.requested + self.WINDOW, self.parts_total) - 1:
+                self.request_config()
+            return
+        text: str = ''.join(self.parts[i] for i in range(self.parts_total))
+        self.parts = {}
+        if sync_revision(text) != message['rev']:
+            raise ValueError('schedules do not match their revision')
+        payload: Any = json.loads(text)
+        if not valid_sync_payload(payload):
+            raise ValueError('malformed schedules')
+        self.revision = message['rev']
+        self.received.emit(payload)
+        logging.info(f'Received schedules from sync master, revision {self.revision}')
+
+    def answer(self, message: Dict[str, Any], received: int, host: QHostAddress, port: int) -> None:
+        """Отвечает ведомому на запрос времени или расписаний.
+
+        На запрос времени - отметками t1/t2 и отпечатком расписаний, на запрос расписаний - ими по частям.
+        """
+        rev, datagrams = self.payload()
+        if message['type'] == 'time' and valid_sync_message(message, {'t0': int}):
+            self.send({'type': 'time', 't0': message['t0'], 't1': received, 'rev': rev,
+                       't2': QDateTime.currentMSecsSinceEpoch()}, host, port)
+        elif message['type'] == 'config':
+            first: int = message['part'] if valid_sync_message(message, {'part': int}) else 0
+            for data in datagrams[max(0, first):max(0, first) + self.WINDOW]:
+                self.write(data, host, port)
+
+    def measure(self, message: Dict[str, Any], received: int) -> None:
+        """Вычисляет смещение часов по отметкам t0..t3 и при необходимости запрашивает новые расписания."""
+        t0, t1, t2, t3 = message['t0'], message['t1'], message['t2'], received
+        delay: int = (t3 - t0) - (t2 - t1)
+        self.samples.append((delay, ((t1 - t0) + (t2 - t3)) // 2))
+        best_delay, offset = min(self.samples)
+        self.timeline.set_offset(offset)
+        logging.debug(f'Sync offset {offset} ms, delay {best_delay} ms')
+        if message['rev'] != self.revision:
+            self.request_config()
+
+
+def percentile(values: List[int], p: float) -> int:
+    """Возвращает перцентиль p (0-100) отсортированного списка методом ближайшего ранга."""
+    if not values:
+        return 0
+    return values[max(0, min(len(values), ceil(len(values) * p / 100)) - 1)]
+
+
+class BellStats:
+    """Статистика задержек звонков: от запланированного момента до срабатывания таймера и до начала звука."""
+    PENDING_TIMEOUT: int = 30000  # мс; звонок, не начавшийся за это время, в статистику не попадает
+
+    def __init__(self, limit: int = 1000) -> None:
+        self.limit: int = limit
+        self.samples: Dict[str, deque] = {}
+        # Незавершённые замеры по зонам: звонки в разных зонах начинаются одновременно
+        self.pending: Dict[str, tuple[str, int, int]] = {}
+
+    def fired(self, name: str, scheduled: QDateTime, zone: str = '') -> None:
+        """Запоминает срабатывание звонка в зоне до вызова play()."""
+        self.pending[zone] = (name, scheduled.toMSecsSinceEpoch(), QDateTime.currentMSecsSinceEpoch())
+
+    def started(self, zone: str = '') -> None:
+        """Завершает замер зоны, когда её плеер сообщил о начале воспроизведения."""
+        if (pending := self.pending.pop(zone, None)) is None:
+            return
+        name, scheduled, fired = pending
+        if QDateTime.currentMSecsSinceEpoch() - fired > self.PENDING_TIMEOUT:
+            logging.warning(f'Bell {name} did not start within {self.PENDING_TIMEOUT} ms, latency not recorded')
+            return
+        start: int = QDateTime.currentMSecsSinceEpoch() - scheduled
+        self.samples.setdefault(name, deque(maxlen=self.limit)).append((scheduled, fired - scheduled, start))
+        logging.info(f'Bell latency, {name}: fired {fired - scheduled} ms, started {start} ms')
+
+    def cancel(self, zone: str = '') -> None:
+        """Отбрасывает замер зоны, если плеер не смог начать воспроизведение."""
+        self.pending.pop(zone, None)
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Возвращает p50/p95/max задержек срабатывания и начала звука по каждому расписанию."""
+        out: Dict[str, Dict[str, int]] = {}
+        for name, samples in self.samples.items():
+            fire: List[int] = sorted(x[1] for x in samples)
+            start: List[int] = sorted(x[2] for x in samples)
+            out[name] = {'count': len(samples),
+                         'fire_p50': percentile(fire, 50), 'fire_p95': percentile(fire, 95), 'fire_max': fire[-1],
+                         'start_p50': percentile(start, 50), 'start_p95': percentile(start, 95),
+                         'start_max': start[-1]}
+        return out
+
+    def export(self, path: str) -> None:
+        """Сохраняет сводку и все замеры в JSON-файл."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'summary': self.summary(),
+                       'samples': {name: [{'scheduled': x[0], 'fire_ms': x[1], 'start_ms': x[2]} for x in samples]
+                                   for name, samples in self.samples.items()}}, f, ensure_ascii=False, indent=2)
+        logging.info('Exported bell latency stats to ' + path)
+
+
+class BellStatsDialog(QDialog):
+    """Диалог со сводкой задержек звонков."""
+
+    def __init__(self, stats: BellStats, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle('Задержки звонков')
+        self.setMinimumWidth(500)
+        self.stats: BellStats = stats
+
+        lay: QVBoxLayout = QVBoxLayout(self)
+        self.setLayout(lay)
+
+        self.table: QListWidget = QListWidget(self)
+        for name, s in stats.summary().items():
+            self.table.addItem(f"{name} ({s['count']}): срабатывание p50 {s['fire_p50']} / p95 {s['fire_p95']} / "
+                               f"max {s['fire_max']} мс, звук p50 {s['start_p50']} / p95 {s['start_p95']} / "
+                               f"max {s['start_max']} мс")
+        if not self.table.count():
+            self.table.addItem('Звонков ещё не было')
+        lay.addWidget(self.table)
+
+        export_btn: QPushButton = QPushButton('Экспорт в JSON', self)
+        export_btn.clicked.connect(self.export)
+        lay.addWidget(export_btn)
+
+    def export(self) -> None:
+        """Открывает диалог сохранения и экспортирует статистику."""
+        path, _ = QFileDialog.getSaveFileName(self, 'Экспорт', expanduser('~') + '/bell_stats.json', 'JSON (*.json)')
+        if path:
+            self.stats.export(path)
+
+
+class StallWatchdog(QObject):
+    """Сторож цикла событий: таймер в потоке интерфейса отмечает пульс, фоновый поток проверяет его.
+
+    Если пульса нет дольше config['stall_threshold'] мс, сторож снимает стек главного потока
+    (sys._current_frames), а после восстановления пишет в stalls.log длительность зависания, стек
+    и то, пришёлся ли на зависание звонок. Пульс и проверка идут с периодом в половину порога;
+    при нулевом пороге сторож не запускается и не будит процесс.
+    """
+
+    def __init__(self, timeline: BellTimeline, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.timeline: BellTimeline = timeline
+        self.beat: float = monotonic()
+        self.interval: int = 0
+        self.main_id: int = threading.main_thread().ident
+        self.stall: Optional[Dict[str, Any]] = None
+        self.stop_event: threading.Event = threading.Event()
+
+        self.log: logging.Logger = logging.getLogger('zvonki.stalls')
+        self.log.propagate = False
+        if not self.log.handlers:
+            handler: RotatingFileHandler = RotatingFileHandler(STALLS_PATH, maxBytes=1 << 20, backupCount=1,
+                                                               encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.log.addHandler(handler)
+
+        self.timer: QTimer = QTimer(self)
+        self.timer.timeout.connect(self.heartbeat)
+        self.restart()
+
+    def heartbeat(self) -> None:
+        self.beat = monotonic()
+
+    def restart(self) -> None:
+        """Перезапускает сторож с текущим порогом (при запуске и после изменения настроек)."""
+        self.stop()
+        if config['stall_threshold'] <= 0:
+            return
+        self.interval = max(50, config['stall_threshold'] // 2)
+        self.beat = monotonic()
+        self.stall = None
+        self.timer.start(self.interval)
+        # У каждого запуска своё событие: старый поток завершится по своему, даже если ещё не проснулся
+        self.stop_event = threading.Event()
+        threading.Thread(target=self.watch, args=(self.stop_event, self.interval, config['stall_threshold']),
+                         name='stall-watchdog', daemon=True).start()
+
+    def stop(self) -> None:
+        """Останавливает сторож (при выходе из программы и перед перезапуском)."""
+        self.timer.stop()
+        self.stop_event.set()
+
+    def watch(self, stop_event: threading.Event, interval: int, threshold: int) -> None:
+        """Цикл фонового потока."""
+        while not stop_event.wait(interval / 1000):
+            beat: float = self.beat
+            gap: float = monotonic() - beat
+            if self.stall is None:
+                if gap * 1000 > threshold + interval:
+                    self.capture(beat, gap)
+            elif beat != self.stall['beat']:
+                self.report(beat)
+
+    def capture(self, beat: float, gap: float) -> None:
+        """Снимает стек главного потока, пока он заблокирован."""
+        frame: Any = sys._current_frames().get(self.main_id)
+        # Поток интерфейса стоит, поэтому чтение цели таймера звонков безопасно
+        target: Optional[QDateTime] = self.timeline.target
+        self.stall = {'beat': beat, 'start': QDateTime.currentMSecsSinceEpoch() - int(gap * 1000),
+                      'target': None if target is None else target.toMSecsSinceEpoch() - self.timeline.offset,
+                      'stack': ''.join(traceback.format_stack(frame)) if frame is not None else ''}
+
+    def report(self, beat: float) -> None:
+        """Записывает завершившееся зависание."""
+        stall: Dict[str, Any] = self.stall
+        self.stall = None
+        duration: int = int((beat - stall['beat']) * 1000) - self.interval
+        end: int = stall['start'] + duration
+        due: bool = stall['target'] is not None and stall['start'] <= stall['target'] <= end
+        bell: str = ''
+        if due:
+            at: str = QDateTime.fromMSecsSinceEpoch(stall['target']).toString('hh:mm:ss')
+            bell = f', bell at {at} delayed by {end - stall["target"]} ms'
+        self.log.warning(f'Event loop stalled for {duration} ms{bell}\n{stall["stack"]}')
+        logging.warning(f'Event loop stalled for {duration} ms' + (' during a bell' if due else ''))
+
+
+def zone_device(device_id: str) -> QAudioDevice:
+    """Возвращает устройство вывода по шестнадцатеричному id; пустой или отключённый id - устройство по умолчанию."""
+    from PyQt6.QtMultimedia import QMediaDevices
+    if device_id:
+        for device in QMediaDevices.audioOutputs():
+            if bytes(device.id()).hex() == device_id:
+                return device
+        logging.warning(f'Audio output {device_id} not found, using default device')
+    return QMediaDevices.defaultAudioOutput()
+
+
+def group_by_zone(items: Iterable[Any]) -> Dict[str, List[Any]]:
+    """Раскладывает события (или пары (время, событие)) по зонам; неизвестные зоны считаются основной."""
+    out: Dict[str, List[Any]] = {}
+    for entry in items:
+        zone: str = (entry[1] if isinstance(entry, tuple) else entry).zone
+        out.setdefault(zone if zone in config['zones'] else '', []).append(entry)
+    return out
+
+
+class ZonePlayer(QObject):
+    """Плеер зоны: своё устройство вывода, свой курсор по общему плейлисту и своё ограничение длительности звонка.
+
+    Используется для дополнительных зон в окне и для всех зон в режиме без интерфейса.
+    """
+
+    def __init__(self, name: str, device: QAudioDevice, bell_stats: BellStats, volume: Callable[[], float],
+                 parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.name: str = name
+        self.bell_stats: BellStats = bell_stats
+        self.volume: Callable[[], float] = volume
+        from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+        self.player: QMediaPlayer = QMediaPlayer(self)
+        self.audio: QAudioOutput = QAudioOutput(device, self)
+        self.player.setAudioOutput(self.audio)
+        self.apply_volume()
+        self.row: int = 0
+
+        self.cutoff: BellCutoff = BellCutoff(self.player, self.audio, self)
+        self.cutoff.finished.connect(self.next_song)
+        self.cutoff.released.connect(self.apply_volume)
+        self.player.mediaStatusChanged.connect(self.media_status)
+        self.player.playingChanged.connect(lambda playing: playing and self.bell_stats.started(self.name))
+        self.player.errorOccurred.connect(lambda: self.bell_stats.cancel(self.name))
+        self.load_song()
+
+    def apply_volume(self) -> None:
+        """Выставляет громкость приложения."""
+        self.audio.setVolume(self.volume())
+
+    def song(self) -> str:
+        """Возвращает путь текущего трека плейлиста."""
+        return config['playlist'][self.row]
+
+    def playlist_loaded(self) -> bool:
+        """Проверяет, что в плеер загружен текущий трек плейлиста."""
+        return bool(config['playlist']) and self.player.source() == QUrl(self.song())
+
+    def load_song(self) -> None:
+        """Загружает текущий трек плейлиста, пропуская отсутствующие файлы."""
+        count: int = len(config['playlist'])
+        for _ in range(count):
+            self.row %= count
+            if isfile(self.song()):
+                self.player.setSource(QUrl(self.song()))
+                return
+            logging.warning(f'Skipped missing track: {self.song()}')
+            self.row += 1
+
+    def next_song(self) -> None:
+        """Переключает на следующий трек плейлиста."""
+        self.row += 1
+        self.load_song()
+
+    def media_status(self, status: QMediaPlayer.MediaStatus) -> None:
+        """Переходит к следующему треку после окончания или ошибки, после файла по времени возвращается к плейлисту."""
+        from PyQt6.QtMultimedia import QMediaPlayer
+        if status == QMediaPlayer.MediaStatus.InvalidMedia:
+            self.bell_stats.cancel(self.name)
+        if status in (QMediaPlayer.MediaStatus.EndOfMedia, QMediaPlayer.MediaStatus.InvalidMedia):
+            if self.playlist_loaded():
+                self.next_song()
+            else:
+                self.load_song()
+
+    def prearm(self) -> None:
+        """Заранее загружает трек плейлиста перед звонком по расписанию."""
+        if not self.player.isPlaying() and not self.playlist_loaded():
+            self.load_song()
+
+    def fire_schedule(self, items: List[tuple[QDateTime, Any]]) -> None:
+        """Запускает звонок по первому из наступивших расписаний, если плеер зоны свободен."""
+        if self.player.isPlaying() or not config['playlist']:
+            return
+        scheduled, x = items[0]
+        if not self.playlist_loaded():
+            self.load_song()
+        self.bell_stats.fired(x.text(), scheduled, self.name)
+        self.cutoff.start(x.text(), x.duration)
+        self.player.play()
+        logging.info(f'Playing song, schedule {x.text()}, zone {self.name or "main"}')
+
+    def fire_timed(self, items: List[tuple[QDateTime, Any]]) -> Optional[Any]:
+        """Воспроизводит последний из наступивших элементов, если плеер зоны свободен, и возвращает его."""
+        if self.player.isPlaying():
+            return None
+        scheduled, item = items[-1]
+        self.player.setSource(QUrl.fromLocalFile(item.file_path))
+        self.bell_stats.fired(basename(item.file_path), scheduled, self.name)
+        self.player.play()
+        logging.info(f'Playing timed file: {item.file_path}, zone {self.name or "main"}')
+        return item
+
+
+class ZoneComboBox(QComboBox):
+    """Выбор зоны воспроизведения; пустое имя - основная зона."""
+
+    def __init__(self, zone: str, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.addItem('Основная зона', '')
+        for name in config['zones']:
+            self.addItem(name, name)
+        self.setCurrentIndex(max(0, self.findData(zone)))
+
+    def zone(self) -> str:
+        """Возвращает имя выбранной зоны."""
+        return self.currentData()
+
+
+class ZonesDialog(QDialog):
+    """Диалог зон воспроизведения: имя зоны и устройство вывода."""
+
+    def __init__(self, parent: Optional[MainWindow] = None) -> None:
+        super().__init__(parent)
+        self.parent: Optional[MainWindow] = parent
+        self.setWindowTitle('Зоны воспроизведения')
+        self.setMinimumWidth(350)
+
+        lay: QVBoxLayout = QVBoxLayout(self)
+        self.setLayout(lay)
+        self.table: QListWidget = QListWidget(self)
+        lay.addWidget(self.table)
+
+        buttons: QHBoxLayout = QHBoxLayout()
+        add: QPushButton = QPushButton('Добавить', self)
+        add.clicked.connect(self.add)
+        remove: QPushButton = QPushButton('Удалить', self)
+        remove.clicked.connect(self.remove)
+        buttons.addWidget(add)
+        buttons.addWidget(remove)
+        lay.addLayout(buttons)
+        self.load()
+
+    def load(self) -> None:
+        """Заполняет список зон."""
+        from PyQt6.QtMultimedia import QMediaDevices
+        self.table.clear()
+        names: Dict[str, str] = {bytes(d.id()).hex(): d.description() for d in QMediaDevices.audioOutputs()}
+        for name, device in config['zones'].items():
+            item: QListWidgetItem = QListWidgetItem(f'{name} - {names.get(device, "устройство не найдено")}')
+            item.setData(Qt.ItemDataRole.UserRole, name)
+            self.table.addItem(item)
+
+    def add(self) -> None:
+        """Добавляет зону с выбранным устройством вывода."""
+        name, ok = QInputDialog.getText(self, 'Добавить зону', 'Имя')
+        if not ok or not name or name in config['zones']:
+            return
+        from PyQt6.QtMultimedia import QMediaDevices
+        devices: List[QAudioDevice] = QMediaDevices.audioOutputs()
+        description, ok = QInputDialog.getItem(self, 'Добавить зону', 'Устройство вывода',
+                                               [d.description() for d in devices], 0, False)
+        if not ok:
+            return
+        device: QAudioDevice = next(d for d in devices if d.description() == description)
+        config['zones'][name] = bytes(device.id()).hex()
+        storage.set_value('zones')
+        self.parent.load_zones()
+        self.load()
+        logging.info(f'Added zone {name} on {description}')
+
+    def remove(self) -> None:
+        """Удаляет выбранную зону; её расписания и элементы будут звучать в основной зоне."""
+        if (item := self.table.currentItem()) is None:
+            return
+        del config['zones'][item.data(Qt.ItemDataRole.UserRole)]
+        storage.set_value('zones')
+        self.parent.load_zones()
+        self.load()
 
 
 class MainWindow(QMainWindow):
-    """Главное окно приложения."""
+    """Главное окно приложения.
+
+    Конструктор создаёт только каркас окна, данные и системная громкость загружаются
+    в load_deferred после первой отрисовки.
+    """
+    loaded: pyqtSignal = pyqtSignal()
+
+    LOAD_CHUNK: int = 200
 
     def __init__(self) -> None:
         super().__init__()
@@ -1002,29 +3838,53 @@ class MainWindow(QMainWindow):
         self.setDockOptions(QMainWindow.DockOption.AnimatedDocks)
         self.setMinimumSize(600, 320)
 
+        from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
         self.player: QMediaPlayer = QMediaPlayer()
         self.audio: QAudioOutput = QAudioOutput()
-        self.audio_d: QAudioDecoder = QAudioDecoder()
         self.player.setAudioOutput(self.audio)
         self.player.mediaStatusChanged.connect(self.media_status)
         self.player.playingChanged.connect(self.check_play)
+        self.player.durationChanged.connect(self.song_duration)
 
         self.is_repeat: bool = False
+        self.bell_stats: BellStats = BellStats()
+        self.player.errorOccurred.connect(lambda: self.bell_stats.cancel())
 
-        self.settings: Settings = Settings(self)
+        self.timeline: BellTimeline = BellTimeline(lambda: self.schedule.items(), lambda: self.timed_playlist.items(),
+                                                   self)
+        self.watchdog: StallWatchdog = StallWatchdog(self.timeline, self)
+
+        self.settings: Optional[Settings] = None
         self.schedule: Schedule = Schedule(self)
         self.timed_playlist: TimedPlaylist = TimedPlaylist(self)
+        self.zones: Dict[str, ZonePlayer] = {}
+        self.timeline.schedule_due.connect(self.fire_schedules)
+        self.timeline.timed_due.connect(self.fire_timed)
+        self.timeline.timed_expired.connect(self.timed_playlist.remove_items)
+        self.timeline.upcoming.connect(self.prearm)
 
         self.menu: Actions = Actions(self)
         self.setMenuBar(self.menu)
 
         self.table: PlaylistWidget = PlaylistWidget(self)
+        self.media_cache: MediaCache = MediaCache(MEDIA_CACHE_PATH, self)
+        self.media_cache.updated.connect(self.table.model.refresh)
+        self.media_cache.updated.connect(self.skip_broken)
+        self.media_cache.updated.connect(lambda: self.player.isPlaying() or self.apply_volume())
+        self.loudness: LoudnessAnalyzer = LoudnessAnalyzer(self.media_cache, self)
+        # После загрузки весь список проверяется один раз, дальше - только изменившиеся файлы
+        self.media_cache.changed.connect(self.loudness.analyze)
+        self.player.sourceChanged.connect(self.apply_volume)
+        self.warned: set[str] = set()
+        self.lookahead_timer: QTimer = QTimer(self)
+        self.lookahead_timer.setInterval(60000)
+        self.lookahead_timer.timeout.connect(self.look_ahead)
+        self.table.model.media = self.media_cache
         self.progress_bar: Progress = Progress(self)
 
         self.volume_pr: VolumeSlider = VolumeSlider(self)
         self.volume_pr.slider.setValue(config['volume'])
         self.volume_sys: SystemVolumeSlider = SystemVolumeSlider(self)
-        self.volume_sys.slider.setValue(int(round(self.volume_sys.volume_object.GetMasterVolumeLevelScalar() * 100, 0)))
 
         self.addDockWidget(Qt.DockWidgetArea.TopDockWidgetArea, self.volume_sys)
         self.addDockWidget(Qt.DockWidgetArea.TopDockWidgetArea, self.volume_pr)
@@ -1033,13 +3893,6 @@ class MainWindow(QMainWindow):
         self.addDockWidget(Qt.DockWidgetArea.TopDockWidgetArea, self.timed_playlist)
         self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.progress_bar)
 
-        if config['sort_restart']:
-            self.sort_by_random()
-        else:
-            self.load_playlist()
-        self.load_schedules()
-        self.timed_playlist.load_items()
-
         self.tray: QSystemTrayIcon = QSystemTrayIcon(self.windowIcon(), self)
         tray_menu: QMenu = QMenu(self)
         show_btn: QAction = QAction('Открыть', tray_menu)
@@ -1048,15 +3901,75 @@ class MainWindow(QMainWindow):
         self.tray.setContextMenu(tray_menu)
         self.tray.show()
 
-    def add_song(self, song: str) -> None:
-        """Добавляет песню в плейлист."""
-        self.table.add_item(song)
+        QTimer.singleShot(0, self.load_deferred)
+
+    def load_deferred(self) -> None:
+        """Запускает поэтапную загрузку данных после показа окна."""
+        self.loader: Iterator[None] = self.load_stages()
+        self.load_step()
+
+    def load_step(self) -> None:
+        """Выполняет очередной этап загрузки и возвращает управление циклу событий до следующего."""
+        try:
+            next(self.loader)
+        except StopIteration:
+            return
+        QTimer.singleShot(0, self.load_step)
+
+    def load_stages(self) -> Iterator[None]:
+        """Загружает зоны, плейлист, расписания, элементы по времени и системную громкость.
+
+        Между этапами и пачками по LOAD_CHUNK элементов окно успевает перерисоваться и обработать ввод.
+        """
+        self.load_zones()
+        self.sync: BellSync = BellSync(self.timeline, self)
+        self.sync.received.connect(self.apply_sync)
+        yield
+        if config['sort_restart']:
+            shuffle(config['playlist'])
+            storage.playlist_moved(0, len(config['playlist']))
+        self.table.model.set_paths(config['playlist'])
+        if config['playlist']:
+            self.table.change_song(0)
+        paths: List[str] = list(config['playlist'])
+        for i in range(0, len(paths), self.LOAD_CHUNK * 10):
+            self.media_cache.request(paths[i:i + self.LOAD_CHUNK * 10])
+            yield
+        names: List[str] = list(config['schedules'])
+        for i in range(0, len(names), self.LOAD_CHUNK):
+            self.load_schedules(names[i:i + self.LOAD_CHUNK])
+            yield
+        self.timed_playlist.table.clear()
+        entries: List[Dict[str, str]] = list(config['timed_playlist'])
+        for i in range(0, len(entries), self.LOAD_CHUNK):
+            self.timed_playlist.add_entries(entries[i:i + self.LOAD_CHUNK])
+            yield
+        self.timeline.invalidate()
+        self.analyze_loudness()
+        self.look_ahead()
+        self.lookahead_timer.start()
+        yield
+        try:
+            self.volume_sys.connect_device()
+        except Exception as e:
+            logging.error('System volume unavailable - ' + str(e))
+        self.loaded.emit()
+
+    def show_settings(self) -> None:
+        """Открывает диалог настроек, создавая его при первом обращении."""
+        if self.settings is None:
+            self.settings = Settings(self)
+        self.settings.exec()
+
+    def add_songs(self, songs: List[str]) -> None:
+        """Добавляет песни в плейлист."""
+        self.table.add_items(songs)
+        self.media_cache.request(songs)
 
     def load_playlist(self) -> None:
         """Загружает плейлист из конфигурации."""
-        self.table.table.clear()
-        for song in config['playlist']:
-            self.add_song(song)
+        self.table.model.set_paths(config['playlist'])
+        self.media_cache.request(config['playlist'])
         if config['playlist']:
             self.table.change_song(0)
 
@@ -1071,30 +3984,155 @@ class MainWindow(QMainWindow):
         else:
             self.player.pause()
 
+    def apply_sync(self, payload: Dict[str, Any]) -> None:
+        """Показывает расписания, полученные от ведущего узла."""
+        apply_sync_payload(payload)
+        self.schedule.table.clear()
+        self.load_schedules()
+        self.timed_playlist.load_items()
+
+    def load_zones(self) -> None:
+        """Создаёт плееры дополнительных зон заново по config['zones']."""
+        for zone in self.zones.values():
+            zone.player.stop()
+            zone.deleteLater()
+        self.zones = {name: ZonePlayer(name, zone_device(device), self.bell_stats,
+                                       lambda: self.volume_pr.slider.value() / 100, self)
+                      for name, device in config['zones'].items()}
+
+    def fire_schedules(self, items: List[tuple[QDateTime, ScheduleList]]) -> None:
+        """Передаёт наступившие звонки основной зоне и плеерам дополнительных зон."""
+        for zone, zone_items in group_by_zone(items).items():
+            if zone:
+                self.zones[zone].fire_schedule(zone_items)
+            else:
+                self.schedule.fire(zone_items)
+
+    def fire_timed(self, items: List[tuple[QDateTime, TimedPlaylistItem]]) -> None:
+        """Передаёт наступившие элементы по времени основной зоне и плеерам дополнительных зон."""
+        for zone, zone_items in group_by_zone(items).items():
+            if not zone:
+                self.timed_playlist.fire(zone_items)
+            elif (item := self.zones[zone].fire_timed(zone_items)) is not None and not item.days.startswith('d'):
+                self.timed_playlist.remove_items([item])
+
+    def prearm(self, schedules: List[ScheduleList], timed: List[TimedPlaylistItem]) -> None:
+        """Заранее загружает трек ближайшего звонка, чтобы в момент звонка оставалось только начать воспроизведение."""
+        schedule_zones: Dict[str, List[ScheduleList]] = group_by_zone(schedules)
+        for zone in schedule_zones:
+            if zone:
+                self.zones[zone].prearm()
+        schedules = schedule_zones.get('', [])
+        timed = group_by_zone(timed).get('', [])
+        if self.player.isPlaying() or not schedules and not timed:
+            return
+        self.skip_broken()
+        if schedules:
+            self.timed_playlist.disarm()
+            self.schedule.prearm()
+        else:
+            self.timed_playlist.prearm(timed)
+
     def check_play(self) -> None:
-        """Обновляет иконку кнопки воспроизведения."""
+        """Обновляет иконку кнопки воспроизведения и завершает замер задержки звонка."""
         self.progress_bar.play_btn.setText('⏸️' if self.player.isPlaying() else '▶️')
+        if self.player.isPlaying():
+            self.bell_stats.started()
 
     def repeat(self) -> None:
         """Переключает режим повтора трека."""
         self.is_repeat = not self.is_repeat
         self.progress_bar.repeat_btn.setText('⏩' if self.is_repeat else '🔁')
 
+    def next_playable(self, row: int) -> int:
+        """Возвращает номер первого трека начиная с row, который не отсутствует и не отвергнут плеером."""
+        count: int = self.table.count()
+        for i in range(count):
+            if self.media_cache.playable(self.table.model.path((row + i) % count)):
+                return (row + i) % count
+        return row % count
+
     def next_song(self) -> None:
-        """Переключает на следующий трек."""
-        if self.table.table.count():
-            self.table.change_song((self.table.table.currentRow() + 1) % self.table.table.count())
+        """Переключает на следующий трек, пропуская отсутствующие и неподдерживаемые файлы."""
+        if self.table.count():
+            self.table.change_song(self.next_playable(self.table.current_row() + 1))
+            self.look_ahead()
+
+    def look_ahead(self) -> None:
+        """Перепроверяет ближайшие треки плейлиста и файлы элементов по времени, пока звонка нет."""
+        if (count := self.table.count()) and (row := self.table.current_row()) >= 0:
+            self.media_cache.request([self.table.model.path((row + i) % count)
+                                      for i in range(min(count, config['lookahead'] + 1))])
+        self.media_cache.request([item.file_path for item in self.timed_playlist.items()])
+
+    def skip_broken(self) -> None:
+        """Заранее уводит курсор с битого трека и предупреждает о битых файлах ближайших элементов по времени."""
+        if self.table.count() and not self.player.isPlaying() and self.timed_playlist.prearmed is None:
+            row: int = self.table.current_row()
+            if row >= 0 and not self.media_cache.playable(self.table.get_song()):
+                if (nxt := self.next_playable(row)) != row:
+                    logging.warning(f'Skipped broken track before bell: {self.table.get_song()}')
+                    self.table.change_song(nxt)
+                elif self.table.get_song() not in self.warned:
+                    self.warned.add(self.table.get_song())
+                    self.tray.showMessage('Звонки', 'В плейлисте нет ни одного воспроизводимого трека',
+                                          QSystemTrayIcon.MessageIcon.Warning)
+        for item in self.timed_playlist.items():
+            if self.media_cache.playable(item.file_path):
+                self.warned.discard(item.file_path)
+            elif item.file_path not in self.warned:
+                self.warned.add(item.file_path)
+                logging.warning(f'Timed file is missing or unsupported: {item.file_path}')
+                self.tray.showMessage('Звонки', f'Файл недоступен: {basename(item.file_path)}',
+                                      QSystemTrayIcon.MessageIcon.Warning)
 
     def previous_song(self) -> None:
         """Переключает на предыдущий трек."""
-        if self.table.table.count():
-            self.table.change_song((self.table.table.currentRow() - 1) % self.table.table.count())
+        if self.table.count():
+            self.table.change_song((self.table.current_row() - 1) % self.table.count())
+
+    def playlist_source(self) -> Optional[str]:
+        """Возвращает путь текущего трека плейлиста, если именно он загружен в плеер."""
+        if self.table.count() and self.table.current_row() >= 0 and \
+                self.player.source() == QUrl(path := self.table.get_song()):
+            return path
+        return None
+
+    def seek(self, position: int) -> None:
+        """Перематывает трек; ручная перемотка снимает контроль длительности звонка."""
+        self.schedule.cutoff.cancel('seek')
+        self.player.setPosition(position)
+
+    def current_path(self) -> str:
+        """Возвращает путь файла, загруженного в плеер."""
+        return self.playlist_source() or self.player.source().toLocalFile()
+
+    def apply_volume(self) -> None:
+        """Выставляет громкость слайдера с поправкой на громкость загруженного трека."""
+        gain: float = self.media_cache.gain(self.current_path()) if config['normalize'] else 1.0
+        self.audio.setVolume(min(1.0, self.volume_pr.slider.value() / 100 * gain))
+        for zone in self.zones.values():
+            if zone.cutoff.name is None:  # Не сбиваем затухание идущего звонка
+                zone.apply_volume()
+
+    def analyze_loudness(self) -> None:
+        """Отдаёт на измерение громкости треки плейлиста и файлы элементов по времени."""
+        self.loudness.analyze(config['playlist'] + [item.file_path for item in self.timed_playlist.items()])
+
+    def song_duration(self, duration: int) -> None:
+        """Запоминает длительность загруженного трека плейлиста в кэше."""
+        if duration > 0 and (path := self.playlist_source()) is not None:
+            self.media_cache.set_duration(path, duration)
 
     def media_status(self, status: QMediaPlayer.MediaStatus) -> None:
         """Обрабатывает изменение статуса медиа."""
+        from PyQt6.QtMultimedia import QMediaPlayer
         if (status == QMediaPlayer.MediaStatus.InvalidMedia or status == QMediaPlayer.MediaStatus.LoadedMedia
-                and self.player.duration() == 0 and self.table.table.count() - self.table.table.currentRow() > 1):
+                and self.player.duration() == 0 and self.table.count() - self.table.current_row() > 1):
             self.progress_bar.setWindowTitle('Ошибка: формат файла не поддерживается')
+            self.bell_stats.cancel()
+            if (path := self.playlist_source()) is not None:
+                self.media_cache.mark_invalid(path)
             self.next_song()
         if status == QMediaPlayer.MediaStatus.EndOfMedia:
             if not self.is_repeat:
@@ -1103,60 +4141,78 @@ class MainWindow(QMainWindow):
     def open_songs(self) -> None:
         """Открывает диалог для добавления песен."""
         files, _ = QFileDialog.getOpenFileNames(self, 'Добавить песни', '/', SUPPORTED_FILES)
-        if files:
-            for file in files:
-                self.add_song(file)
-                config['playlist'].append(file)
-            save_config()
+        self.add_songs(files)
+
+    def open_folder(self) -> None:
+        """Открывает диалог для добавления папки со всеми вложенными медиафайлами."""
+        if folder := QFileDialog.getExistingDirectory(self, 'Добавить папку', expanduser('~')):
+            self.import_paths([folder])
+
+    def import_paths(self, paths: List[str]) -> None:
+        """Добавляет файлы сразу, а папки обходит в фоне с окном прогресса и возможностью отмены."""
+        self.add_songs([p for p in paths if isfile(p)])
+        if not (folders := [p for p in paths if isdir(p)]):
+            return
+        scanner: FolderScanner = FolderScanner(folders, self)
+        dialog: QProgressDialog = QProgressDialog('Поиск файлов...', 'Отмена', 0, 0, self)
+        dialog.setWindowTitle('Добавление папки')
+        dialog.setMinimumDuration(500)
+        dialog.canceled.connect(scanner.cancel)
+        scanner.batch.connect(self.add_songs)
+        scanner.progress.connect(lambda d, f: dialog.setLabelText(f'Просмотрено папок: {d}\nНайдено файлов: {f}'))
+        scanner.finished.connect(dialog.reset)
+        scanner.finished.connect(dialog.deleteLater)
+        scanner.finished.connect(lambda n: logging.info(f'Imported {n} files from {", ".join(folders)}'))
+        scanner.finished.connect(scanner.deleteLater)
+        scanner.start()
 
     def delete_song(self) -> None:
         """Удаляет выбранные песни из плейлиста."""
-        for song in self.table.table.selectedItems():
-            config['playlist'].remove(song.url)
-            self.table.table.takeItem(self.table.table.row(song))
-        save_config()
+        self.table.remove_rows([x.row() for x in self.table.table.selectedIndexes()])
 
     def delete_all(self) -> None:
         """Удаляет все песни из плейлиста."""
-        while self.table.table.count():
-            self.delete_song()
+        self.table.clear()
+        logging.info('Removed all songs')
 
     def sort_by_alphabet(self) -> None:
         """Сортирует плейлист по алфавиту."""
         config['playlist'].sort()
-        save_config()
+        storage.playlist_moved(0, len(config['playlist']))
         self.load_playlist()
 
     def sort_by_random(self) -> None:
         """Сортирует плейлист случайным образом."""
         shuffle(config['playlist'])
-        save_config()
+        storage.playlist_moved(0, len(config['playlist']))
         self.load_playlist()
 
-    def load_schedules(self) -> None:
-        """Загружает расписания из конфигурации."""
-        for s in config['schedules'].keys():
+    def load_schedules(self, names: Optional[List[str]] = None) -> None:
+        """Загружает из конфигурации расписания names (по умолчанию все)."""
+        for s in config['schedules'].keys() if names is None else names:
             item: ScheduleList = ScheduleList(
                 s, config['schedules'][s]['list'], config['schedules'][s]['duration'], config['schedules'][s]['days'],
-                self.schedule.table)
+                self.schedule.table, zone=config['schedules'][s]['zone'])
             if config['schedules'][s]['enabled']:
                 item.setCheckState(Qt.CheckState.Checked)
             self.schedule.add_schedule(item)
 
     def save_base_config(self) -> None:
         """Сохраняет базовую конфигурацию приложения."""
-        config['volume'] = self.volume_pr.slider.value()
-        self.timed_playlist.save_items()
+        if config['volume'] != self.volume_pr.slider.value():
+            config['volume'] = self.volume_pr.slider.value()
+            storage.set_value('volume')
         for x in (self.schedule.table.item(i) for i in range(self.schedule.table.count())):
-            if x.checkState() == Qt.CheckState.Checked:
-                config['schedules'][x.text()]['enabled'] = True
-            else:
-                config['schedules'][x.text()]['enabled'] = False
-        save_config()
+            if config['schedules'][x.text()]['enabled'] != x.is_enabled():
+                config['schedules'][x.text()]['enabled'] = x.is_enabled()
+                storage.schedule_changed(x.text())
 
     def close_program(self) -> None:
         """Закрывает приложение с сохранением конфигурации."""
         self.save_base_config()
+        storage.flush()
+        self.media_cache.shutdown()
+        self.loudness.shutdown()
         logging.warning('Closing program')
         sys.exit()
 
@@ -1167,9 +4223,17 @@ class MainWindow(QMainWindow):
 
     def dropEvent(self, event: QDropEvent) -> None:
         """Обрабатывает событие сброса файлов в окно."""
-        for url in map(lambda u: u.url().replace('file:///', ''), event.mimeData().urls()):
-            self.add_song(url)
-            config['playlist'].append(url)
+        self.import_paths([u.toLocalFile() for u in event.mimeData().urls() if u.isLocalFile()])
+
+    def handle_message(self, args: List[str]) -> None:
+        """Обрабатывает аргументы повторного запуска: добавляет переданные файлы и папки и показывает окно."""
+        paths: List[str] = [a for a in args if not a.startswith('--') and (isfile(a) or isdir(a))]
+        if paths:
+            self.import_paths(paths)
+            logging.info(f'Added {len(paths)} paths from another instance')
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
 
     def closeEvent(self, event: QCloseEvent) -> None:
         """Скрывает окно при закрытии, сохраняя конфигурацию."""
@@ -1178,12 +4242,166 @@ class MainWindow(QMainWindow):
         event.ignore()
 
 
+class HeadlessSchedule:
+    """Расписание для режима без интерфейса: те же поля и методы, что использует BellTimeline у ScheduleList."""
+
+    def __init__(self, name: str, lst: List[str], duration: int, days: str, enabled: bool, zone: str = '') -> None:
+        self.name: str = name
+        self.list: List[str] = lst
+        self.duration: int = duration
+        self.days: str = days
+        self.enabled: bool = enabled
+        self.zone: str = zone
+        self.seconds: array = array('i')
+        self.mask: int = 0
+        self.compile()
+
+    def compile(self) -> None:
+        """Пересобирает отсортированный массив секунд и маску дней по list и days."""
+        self.seconds, self.mask = compile_schedule(self.list, self.days)
+
+    def text(self) -> str:
+        """Возвращает имя расписания."""
+        return self.name
+
+    def is_enabled(self) -> bool:
+        """Возвращает True, если расписание включено."""
+        return self.enabled
+
+
+class HeadlessTimedItem:
+    """Элемент плейлиста по времени для режима без интерфейса."""
+
+    def __init__(self, file_path: str, time: str, days: str, zone: str = '') -> None:
+        self.file_path: str = file_path
+        self.time: str = time
+        self.days: str = days
+        self.zone: str = zone
+
+    def entry(self) -> Dict[str, str]:
+        """Возвращает запись элемента для конфигурации."""
+        return {'file': self.file_path, 'time': self.time, 'days': self.days, 'zone': self.zone}
+
+
+class BellDaemon(QObject):
+    """Звонки без окна, трея и виджетов (--headless) для выделенного компьютера.
+
+    Читает ту же конфигурацию и звонит с той же логикой, что и MainWindow: трек плейлиста по расписанию
+    с ограничением длительности, файлы по времени, удаление прошедших разовых элементов. Каждая зона
+    играет на своём устройстве вывода, основная - на устройстве по умолчанию.
+    """
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.bell_stats: BellStats = BellStats()
+        if config['sort_restart']:
+            shuffle(config['playlist'])
+            storage.playlist_moved(0, len(config['playlist']))
+        self.zones: Dict[str, ZonePlayer] = {
+            name: ZonePlayer(name, zone_device(device), self.bell_stats, lambda: config['volume'] / 100, self)
+            for name, device in [('', ''), *config['zones'].items()]}
+
+        self.schedules: List[HeadlessSchedule] = []
+        self.timed: List[HeadlessTimedItem] = []
+
+        self.timeline: BellTimeline = BellTimeline(lambda: self.schedules, lambda: self.timed, self)
+        self.timeline.schedule_due.connect(self.fire_schedule)
+        self.timeline.timed_due.connect(self.fire_timed)
+        self.timeline.timed_expired.connect(self.remove_timed)
+        self.timeline.upcoming.connect(self.prearm)
+        self.watchdog: StallWatchdog = StallWatchdog(self.timeline, self)
+        self.load_items()
+        self.sync: BellSync = BellSync(self.timeline, self)
+        self.sync.received.connect(self.apply_sync)
+        logging.info(f'Headless mode: {len(self.schedules)} schedules, {len(self.timed)} timed items, '
+                     f'{len(config["playlist"])} songs, {len(self.zones)} zones')
+
+    def apply_sync(self, payload: Dict[str, Any]) -> None:
+        """Применяет расписания, полученные от ведущего узла."""
+        apply_sync_payload(payload)
+        self.load_items()
+
+    def load_items(self) -> None:
+        """Создаёт расписания и элементы по времени из конфигурации."""
+        self.schedules = [HeadlessSchedule(name, x['list'], x['duration'], x['days'], x['enabled'], x['zone'])
+                          for name, x in config['schedules'].items()]
+        self.timed = [HeadlessTimedItem(x['file'], x['time'], x['days'], x['zone']) for x in config['timed_playlist']]
+        self.timeline.invalidate()
+
+    def prearm(self, schedules: List[HeadlessSchedule], timed: List[HeadlessTimedItem]) -> None:
+        """Передаёт ближайшие звонки зонам для заблаговременной загрузки трека."""
+        for zone in group_by_zone(schedules):
+            self.zones[zone].prearm()
+
+    def fire_schedule(self, items: List[tuple[QDateTime, HeadlessSchedule]]) -> None:
+        """Запускает звонки наступивших расписаний, каждый в своей зоне."""
+        for zone, zone_items in group_by_zone(items).items():
+            self.zones[zone].fire_schedule(zone_items)
+
+    def fire_timed(self, items: List[tuple[QDateTime, HeadlessTimedItem]]) -> None:
+        """Воспроизводит наступившие элементы по зонам и удаляет воспроизведённые разовые."""
+        for zone, zone_items in group_by_zone(items).items():
+            if (item := self.zones[zone].fire_timed(zone_items)) is not None and not item.days.startswith('d'):
+                self.remove_timed([item])
+
+    def remove_timed(self, items: List[HeadlessTimedItem]) -> None:
+        """Удаляет разовые элементы из списка и конфигурации."""
+        removed: set[int] = {id(x) for x in items}
+        self.timed = [x for x in self.timed if id(x) not in removed]
+        config['timed_playlist'] = [x.entry() for x in self.timed]
+        storage.timed_removed([x.entry() for x in items])
+
+
+def run_headless() -> int:
+    """Запускает звонки без интерфейса на QCoreApplication; завершается по Ctrl+C или SIGTERM."""
+    load_config()
+    app: QCoreApplication = QCoreApplication(sys.argv)
+    app.aboutToQuit.connect(lambda: storage.flush())
+    lock: QLockFile = QLockFile(CONFIG_DIR + '/instance.lock')
+    lock.setStaleLockTime(0)
+    if not lock.tryLock(100):
+        logging.error('Another instance is already running')
+        print('Программа уже запущена', file=sys.stderr)
+        return 1
+    daemon: BellDaemon = BellDaemon()
+    app.aboutToQuit.connect(daemon.watchdog.stop)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: app.quit())
+    # Обработчики сигналов Python выполняются только при возврате управления в интерпретатор
+    wake: QTimer = QTimer()
+    wake.timeout.connect(lambda: None)
+    wake.start(1000)
+    code: int = app.exec()
+    logging.warning('Headless mode stopped')
+    return code
+
+
 if __name__ == '__main__':
+    from multiprocessing import freeze_support
+    freeze_support()  # Процессы пула измерения громкости в собранном exe
+    if '--headless' in sys.argv:
+        sys.exit(run_headless())
+    profile: StartupProfile = StartupProfile('--profile-startup' in sys.argv)
+    profile.mark('imports')
+    load_config()
+    profile.mark('config')
     app: QApplication = QApplication(sys.argv)
     app.setWindowIcon(QIcon(resource_path('logo.ico')))
-    if is_already_running():
-        msg: QMessageBox = QMessageBox.question(None, 'Внимание!', 'Программа уже запущена!')
+    app.aboutToQuit.connect(lambda: storage.flush())
+    profile.mark('QApplication')
+    lock: QLockFile = QLockFile(CONFIG_DIR + '/instance.lock')
+    lock.setStaleLockTime(0)  # Блокировка умершего процесса всё равно снимается по PID
+    if not lock.tryLock(100):
+        if not send_to_running_instance([abspath(a).replace('\\', '/') if exists(a) else a for a in sys.argv[1:]]):
+            msg: QMessageBox = QMessageBox.question(None, 'Внимание!', 'Программа уже запущена!')
         sys.exit()
+    profile.mark('single instance check')
     window: MainWindow = MainWindow()
+    instance_server: InstanceServer = InstanceServer(window)
+    instance_server.received.connect(window.handle_message)
+    app.aboutToQuit.connect(window.watchdog.stop)
+    profile.mark('main window')
     window.show()
+    profile.mark('show')
+    window.loaded.connect(lambda: (profile.mark('deferred load'), profile.report()))
     sys.exit(app.exec())